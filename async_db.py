@@ -0,0 +1,52 @@
+# async_db.py
+# Асинхронная обёртка над Database для main_async.py
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_POOL_SIZE
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """
+    Выполняет методы Database в отдельном пуле потоков
+
+    sqlite3 блокирующий, поэтому запросы уходят в собственный пул (по одному
+    потоку на соединение из пула БД), а event loop в это время обслуживает
+    других пользователей. Любой метод Database доступен как корутина:
+    await adb.get_user_session(user_id).
+    """
+
+    def __init__(self, database, workers=DB_POOL_SIZE):
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнить произвольную блокирующую функцию в пуле БД"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._db, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return call
+
+    def close(self):
+        """Дождаться выполнения запросов и закрыть пул"""
+        self._executor.shutdown(wait=True)
+        logger.info("🛑 Пул асинхронных запросов к БД остановлен")
+
+
+# Глобальный экземпляр
+adb = AsyncDatabase(db)
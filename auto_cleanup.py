@@ -1,86 +1,151 @@
 # auto_cleanup.py
-# Автоматическое удаление прошедших совещаний
+# Автоматический перенос прошедших совещаний в архив
 
 import threading
 import time
 import logging
 from datetime import datetime, timedelta
-from database import db
+from database import db, MEETING_ADDED
 
 logger = logging.getLogger(__name__)
 
 class AutoCleanup:
-    """Автоматическое удаление прошедших совещаний"""
-    
-    def __init__(self, check_interval=3600):
+    """
+    Автоматическое удаление прошедших совещаний (в архив, см. Database.get_meeting_history)
+
+    Совещание удаляется, когда наступает следующий за его датой день. Вместо
+    проверки раз в час поток спит до полуночи после самой ранней даты в БД
+    и просыпается раньше, только если добавлено совещание (оно может оказаться
+    раньше всех) или бот останавливается.
+    """
+
+    def __init__(self, check_interval=3600, clock=time.time):
         """
         Инициализация автоочистки
-        check_interval - интервал проверки в секундах (по умолчанию 1 час)
+        check_interval - максимальная пауза между пересчётами срока в секундах (по умолчанию 1 час)
+        clock - источник времени в секундах epoch (для тестов)
         """
         self.check_interval = check_interval
+        self.clock = clock
         self.running = False
         self.thread = None
-    
+        self._wake = threading.Event()
+        self.stats = {'runs': 0, 'wakeups': 0, 'meetings_purged': 0}
+
+        db.subscribe(self._on_meetings_changed)
+
     def start(self):
         """Запустить автоочистку в отдельном потоке"""
         if self.running:
             logger.warning("⚠️ Автоочистка уже запущена")
             return
-        
+
         self.running = True
+        self._wake.clear()
         self.thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self.thread.start()
         logger.info("🧹 Автоочистка старых совещаний запущена")
-    
+
     def stop(self):
-        """Остановить автоочистку"""
+        """Остановить автоочистку (поток просыпается сразу)"""
         self.running = False
+        self._wake.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
         logger.info("🛑 Автоочистка остановлена")
-    
+
+    def _on_meetings_changed(self, event, meeting_id):
+        """Новое совещание может истечь раньше запланированной очистки - пересчитать срок"""
+        if event == MEETING_ADDED:
+            self.stats['wakeups'] += 1
+            self._wake.set()
+
+    def next_cleanup_at(self):
+        """Когда истечёт самое раннее совещание (секунды epoch) или None, если совещаний нет"""
+        earliest = db.get_earliest_meeting_date()
+        if earliest is None:
+            return None
+        expires = datetime.strptime(earliest, "%Y-%m-%d") + timedelta(days=1)
+        return expires.timestamp()
+
+    def seconds_until_cleanup(self):
+        """Сколько секунд до очистки (0 - пора), None если удалять нечего"""
+        cleanup_at = self.next_cleanup_at()
+        if cleanup_at is None:
+            return None
+        return max(0.0, cleanup_at - self.clock())
+
+    def tick(self):
+        """
+        Удалить прошедшие совещания, если пора
+
+        Returns:
+            сколько секунд ждать до следующей проверки (не больше check_interval)
+        """
+        try:
+            delay = self.seconds_until_cleanup()
+            if delay == 0:
+                counts = self._cleanup_old_meetings()
+                # После удаления самое раннее совещание - не раньше сегодняшнего
+                delay = self.seconds_until_cleanup() if counts and counts['meetings'] else None
+        except Exception as e:
+            logger.error(f"❌ Ошибка при очистке: {e}")
+            delay = None
+
+        if delay is None:
+            return self.check_interval
+        return min(delay, self.check_interval)
+
     def _cleanup_loop(self):
-        """Основной цикл проверки и удаления"""
+        """Основной цикл: спать до ближайшего истечения и удалять"""
         while self.running:
-            try:
-                self._cleanup_old_meetings()
-            except Exception as e:
-                logger.error(f"❌ Ошибка при очистке: {e}")
-            
-            # Ждем перед следующей проверкой
-            time.sleep(self.check_interval)
-    
+            self._wake.clear()
+            timeout = self.tick()
+            self._wake.wait(timeout)
+
     def _cleanup_old_meetings(self):
         """Удалить все прошедшие совещания"""
-        today = datetime.now().strftime("%d.%m")
-        
+        today = datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d")
+
         try:
-            # Получаем все совещания
-            all_meetings = db.get_all_meetings()
-            
-            deleted_count = 0
-            
-            for meeting in all_meetings:
-                meeting_id = meeting[0]
-                date_str = meeting[2]
-                
-                # Если дата совещания раньше текущей - удаляем
-                if date_str < today:
-                    db.delete_meeting(meeting_id)
-                    deleted_count += 1
-            
-            if deleted_count > 0:
-                logger.info(f"🧹 Удалено прошедших совещаний: {deleted_count}")
+            # Удаляем одним пакетом всё, что раньше сегодняшнего дня
+            started = time.perf_counter()
+            counts = db.purge_meetings_before(today)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats['runs'] += 1
+            self.stats['meetings_purged'] += counts['meetings']
+
+            if counts['meetings'] > 0:
+                logger.info(
+                    f"🧹 Перенесено в архив прошедших совещаний: {counts['meetings']} "
+                    f"(уведомлений: {counts['notifications']}, участников: {counts['participants']}) "
+                    f"за {elapsed_ms:.1f} мс"
+                )
                 info = db.get_database_info()
                 logger.info(f"📊 В БД осталось совещаний: {info['meetings']}")
-        
+
+            return counts
+
         except Exception as e:
             logger.error(f"❌ Ошибка при удалении совещаний: {e}")
-    
+            return None
+
     def cleanup_now(self):
         """Выполнить очистку прямо сейчас (не ждать интервала)"""
         logger.info("🧹 Запуск немедленной очистки...")
-        self._cleanup_old_meetings()
+        counts = self._cleanup_old_meetings()
         logger.info("✅ Очистка завершена")
+        return counts
+
+    def get_stats(self):
+        """Статистика автоочистки"""
+        delay = self.seconds_until_cleanup()
+        return {
+            'running': self.running,
+            'next_cleanup_in': round(delay) if delay is not None else None,
+            **self.stats,
+        }
 
 
 # Глобальный экземпляр
-cleanup = AutoCleanup(check_interval=3600)  # Проверка каждый час
\ No newline at end of file
+cleanup = AutoCleanup(check_interval=3600)  # Срок пересчитывается не реже раза в час
@@ -0,0 +1,202 @@
+# callback_codec.py
+# Компактная кодировка callback_data для inline-кнопок
+#
+# Формат: <версия><код действия>[:<payload>], например "1u:3" вместо "user:Рыжов Д.А.".
+# Telegram ограничивает callback_data 64 байтами, а кириллица в UTF-8 занимает
+# по 2 байта на букву, поэтому имена передаются номером из USERS_DB, даты и
+# время - без разделителей, а всё, что всё равно не помещается, хранится на
+# сервере и передаётся коротким ключом ("1u#a").
+
+import threading
+from collections import OrderedDict
+
+from config import USERS_DB, CALLBACK_PAYLOAD_TABLE_SIZE
+
+# Версия формата: кнопки со старых клавиатур (другая версия или старый формат
+# "action:payload") не разбираются, и бот просит открыть меню заново
+VERSION = "1"
+
+# Telegram: максимальный размер callback_data в байтах
+MAX_CALLBACK_BYTES = 64
+
+# Короткие коды действий (менять только вместе с VERSION)
+ACTION_CODES = {
+    "user": "u",
+    "participant": "p",
+    "date": "d",
+    "time": "t",
+    "duration": "du",
+    "new_meeting": "n",
+    "confirm_participants": "cp",
+    "add_more_participants": "ap",
+    "my_meetings": "mm",
+    "calendar": "c",
+    "calendar_page": "cg",
+    "guest_calendar": "gc",
+    "guest_meetings": "gm",
+    "delete_old_meetings": "do",
+    "delete_meeting": "dm",
+    "confirm_delete": "cd",
+    "cancel_delete": "xd",
+    "logout": "q",
+    "back_to_menu": "bm",
+    "back_to_dates": "bd",
+    "back_to_times": "bt",
+    "back_to_durations": "bu",
+    "back_to_participants": "bp",
+}
+ACTIONS_BY_CODE = {code: action for action, code in ACTION_CODES.items()}
+
+# Номера пользователей - порядок USERS_DB (новых пользователей добавлять в конец)
+USER_NAMES = list(USERS_DB)
+USER_INDEX = {name: index for index, name in enumerate(USER_NAMES)}
+
+
+def _encode_user(name):
+    return str(USER_INDEX[name])
+
+
+def _decode_user(raw):
+    if not raw.isdigit():
+        raise ValueError(raw)
+    return USER_NAMES[int(raw)]
+
+
+def _encode_clock(value):
+    """Убрать разделитель из даты ДД.ММ или времени ЧЧ:ММ"""
+    if len(value) != 5 or not value[:2].isdigit() or not value[3:].isdigit():
+        raise ValueError(value)
+    return value[:2] + value[3:]
+
+
+def _decoder_clock(separator):
+    def decode(raw):
+        if len(raw) != 4 or not raw.isdigit():
+            raise ValueError(raw)
+        return f"{raw[:2]}{separator}{raw[2:]}"
+    return decode
+
+
+# Сжатие payload по действиям: (encode, decode); остальные передаются как есть
+PAYLOAD_FORMATS = {
+    "user": (_encode_user, _decode_user),
+    "participant": (_encode_user, _decode_user),
+    "date": (_encode_clock, _decoder_clock(".")),
+    "time": (_encode_clock, _decoder_clock(":")),
+}
+
+
+class CallbackCodec:
+    """Кодирование (action, payload) <-> callback_data с таблицей длинных payload на сервере"""
+
+    def __init__(self, table_size=CALLBACK_PAYLOAD_TABLE_SIZE):
+        self.table_size = table_size
+        self._table = OrderedDict()  # ключ -> payload
+        self._keys = {}  # payload -> ключ
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.stats = {'encoded': 0, 'stored': 0}
+
+    def encode(self, action, payload=None):
+        """Собрать callback_data для кнопки"""
+        head = f"{VERSION}{ACTION_CODES[action]}"
+        self.stats['encoded'] += 1
+        if payload is None:
+            return head
+
+        payload = str(payload)
+        encode, _ = PAYLOAD_FORMATS.get(action, (None, None))
+        if encode is not None:
+            try:
+                data = f"{head}:{encode(payload)}"
+                if len(data.encode()) <= MAX_CALLBACK_BYTES:
+                    return data
+            except (KeyError, ValueError):
+                pass  # нестандартное значение - передаём через таблицу
+        else:
+            data = f"{head}:{payload}"
+            if len(data.encode()) <= MAX_CALLBACK_BYTES:
+                return data
+
+        return f"{head}#{self._store(payload)}"
+
+    def decode(self, data):
+        """
+        Разобрать callback_data
+
+        Returns:
+            (action, payload) - payload строкой или None
+
+        Raises:
+            ValueError: кнопка со старой клавиатуры, неизвестный код или payload
+        """
+        if not data or data[0] != VERSION:
+            raise ValueError(f"Неподдерживаемая версия callback_data: {data!r}")
+
+        body = data[1:]
+        for separator in (":", "#"):
+            code, found, raw = body.partition(separator)
+            if found:
+                break
+        else:
+            code, raw = body, None
+
+        action = ACTIONS_BY_CODE.get(code)
+        if action is None:
+            raise ValueError(f"Неизвестный код действия: {data!r}")
+        if raw is None:
+            return action, None
+
+        if separator == "#":
+            with self._lock:
+                payload = self._table.get(raw)
+            if payload is None:
+                # Таблица в памяти: после перезапуска или вытеснения ключ не найти
+                raise ValueError(f"Данные кнопки устарели: {data!r}")
+            return action, payload
+
+        _, decode = PAYLOAD_FORMATS.get(action, (None, None))
+        if decode is None:
+            return action, raw
+        try:
+            return action, decode(raw)
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"Некорректные данные кнопки: {data!r}") from e
+
+    def _store(self, payload):
+        """Сохранить payload в таблице и вернуть его короткий ключ"""
+        with self._lock:
+            key = self._keys.get(payload)
+            if key is not None:
+                self._table.move_to_end(key)
+                return key
+
+            key = _base36(self._next_key)
+            self._next_key += 1
+            self._table[key] = payload
+            self._keys[payload] = key
+            if len(self._table) > self.table_size:
+                _, evicted = self._table.popitem(last=False)
+                del self._keys[evicted]
+            self.stats['stored'] += 1
+            return key
+
+    def get_stats(self):
+        """Статистика кодека"""
+        with self._lock:
+            return {'table': len(self._table), **self.stats}
+
+
+def _base36(number):
+    """Число в строку из цифр и латинских букв"""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        number, rest = divmod(number, 36)
+        result = digits[rest] + result
+        if not number:
+            return result
+
+
+# Глобальный экземпляр
+codec = CallbackCodec()
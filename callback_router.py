@@ -0,0 +1,98 @@
+# callback_router.py
+# Маршрутизация нажатий inline-кнопок по action из callback_data
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackRouter:
+    """
+    Таблица обработчиков callback-запросов
+
+    callback_data имеет вид "action" или "action:payload" (либо формат codec,
+    если он задан). Строка разбирается один раз, обработчик ищется в словаре
+    по action (O(1) при любом числе обработчиков), payload приводится к нужному
+    типу. Нажатия, для которых нет обработчика или payload не разбирается,
+    учитываются в статистике.
+    """
+
+    def __init__(self, codec=None):
+        """
+        Args:
+            codec: объект с методом decode(data) -> (action, payload), см. callback_codec
+        """
+        self.codec = codec
+        self._routes = {}  # action -> (обработчик, тип payload)
+        self.stats = {'dispatched': 0, 'unknown': 0, 'bad_payload': 0, 'stale': 0}
+
+    def route(self, *actions, payload=str):
+        """
+        Декоратор: зарегистрировать обработчик handler(user_id, payload) для actions
+
+        Вызывающий код получает обработчик через resolve() и сам передаёт
+        user_id нажавшего (см. handle_callback в main.py и main_async.py).
+
+        Args:
+            actions: одно или несколько действий
+            payload: функция разбора payload (str, int, ...), None - payload не ожидается
+        """
+        def decorator(handler):
+            for action in actions:
+                if action in self._routes:
+                    raise ValueError(f"Обработчик для '{action}' уже зарегистрирован")
+                self._routes[action] = (handler, payload)
+            return handler
+        return decorator
+
+    def parse(self, data):
+        """
+        Разобрать callback_data на (action, payload); payload - строка или None
+
+        Raises:
+            ValueError: codec не смог разобрать данные (кнопка со старой клавиатуры)
+        """
+        if self.codec is not None:
+            return self.codec.decode(data)
+        action, sep, payload = (data or "").partition(":")
+        return action, (payload if sep else None)
+
+    def resolve(self, data):
+        """
+        Найти обработчик для callback_data
+
+        Returns:
+            (обработчик, payload) или None, если обработчика нет или payload некорректен
+        """
+        try:
+            action, raw = self.parse(data)
+        except ValueError as e:
+            self.stats['stale'] += 1
+            logger.info(f"ℹ️ Устаревшая кнопка: {e}")
+            return None
+
+        route = self._routes.get(action)
+        if route is None:
+            self.stats['unknown'] += 1
+            logger.warning(f"⚠️ Неизвестный callback: {data!r}")
+            return None
+
+        handler, decode = route
+        if decode is None:
+            value = None
+        else:
+            try:
+                value = decode(raw) if raw is not None else None
+            except (TypeError, ValueError):
+                value = None
+            if value is None:
+                self.stats['bad_payload'] += 1
+                logger.warning(f"⚠️ Некорректные данные в callback: {data!r}")
+                return None
+
+        self.stats['dispatched'] += 1
+        return handler, value
+
+    def get_stats(self):
+        """Статистика маршрутизации"""
+        return {'routes': len(self._routes), **self.stats}
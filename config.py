@@ -42,6 +42,72 @@ WORKDAYS = [0, 1, 2, 3, 4]
 # Настройки БД
 DATABASE_FILE = "bot_database.db"
 
+# Пул соединений с БД
+DB_POOL_SIZE = 5  # максимум одновременно открытых соединений
+DB_POOL_TIMEOUT = 30  # сколько секунд ждать свободное соединение
+DB_BUSY_TIMEOUT_MS = 2000  # ожидание блокировки внутри SQLite
+DB_BUSY_RETRIES = 5  # повторы запроса после "database is locked"
+DB_CACHE_SIZE_KB = 8192  # кэш страниц на соединение (8 МБ)
+DB_MMAP_SIZE = 64 * 1024 * 1024  # отображение файла БД в память (64 МБ)
+
+# Кэш сессий пользователей в памяти (секунды, None - без ограничения по времени)
+SESSION_CACHE_TTL = 600
+SESSION_CACHE_MAX_ENTRIES = 1000  # сколько пользователей помнить (в том числе не вошедших)
+
+# Состояния диалогов (черновики совещаний)
+CONVERSATION_MAX_USERS = 1000  # сколько пользователей держать в памяти
+CONVERSATION_TTL = 24 * 3600  # через сколько секунд без активности черновик забывается
+CONVERSATION_FLUSH_INTERVAL = 5  # период записи изменений в БД (секунды)
+
+# Кэш готовых экранов со списками совещаний (максимум записей)
+VIEW_CACHE_MAX_ENTRIES = 500
+
+# Максимальный размер страницы календаря (лимит Telegram - 4096 символов)
+CALENDAR_PAGE_CHARS = 3500
+
+# Рассылка уведомлений участникам
+NOTIFY_BATCH_SIZE = 50  # уведомлений за один проход
+NOTIFY_POLL_INTERVAL = 30  # проверка БД, если никто не разбудил (секунды)
+NOTIFY_MAX_RETRIES = 5  # повторы отправки при временных ошибках
+
+# Все исходящие запросы к Telegram (лимиты Bot API: ~30 сообщений/сек, ~1/сек в один чат)
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_CHAT_RATE = 1
+TELEGRAM_CHAT_BURST = 3  # запросов в один чат подряд (правка + новое сообщение при ответе)
+TELEGRAM_MAX_429_RETRIES = 3  # повторы после ответа 429 Too Many Requests
+
+# Общий пул HTTP-соединений (Telegram API и Keep-Alive)
+HTTP_POOL_SIZE = 10  # соединений к одному хосту (не меньше HANDLER_WORKERS + фоновые потоки)
+HTTP_RETRIES = 3  # повторы при ошибках соединения
+HTTP_BACKOFF = 0.5  # множитель паузы между повторами (секунды)
+
+# Keep-Alive: Render усыпляет бесплатный сервис после 15 минут без входящих запросов
+KEEP_ALIVE_SLEEP_AFTER = 15 * 60  # через сколько секунд простоя сервис засыпает
+KEEP_ALIVE_MARGIN = 3 * 60  # пинговать за столько секунд до засыпания
+KEEP_ALIVE_JITTER = 0.1  # случайный сдвиг проверок (доля интервала), чтобы не попадать в такт с другими задачами
+
+# За сколько минут до начала совещания напоминать участникам
+REMINDER_MINUTES_BEFORE = 15
+
+# Webhook-сервер (BOT_MODE=webhook)
+WEBHOOK_WORKERS = 4  # потоков обработки обновлений
+WEBHOOK_QUEUE_SIZE = 100  # обновлений в очереди, сверх лимита - ответ 503
+WEBHOOK_MAX_BODY = 1024 * 1024  # максимальный размер тела запроса (байт)
+
+# Пул обработчиков обновлений (обновления одного пользователя - всегда в одном потоке)
+HANDLER_WORKERS = 4  # число потоков
+HANDLER_QUEUE_SIZE = 50  # обновлений в очереди одного потока
+
+# Длинные данные inline-кнопок, хранящиеся на сервере (максимум записей)
+CALLBACK_PAYLOAD_TABLE_SIZE = 5000
+
+# Кэш готовых клавиатур с параметрами (максимум записей)
+KEYBOARD_CACHE_MAX_ENTRIES = 500
+
+# Правка сообщений: сколько сообщений помнить и интервал склейки частых правок (секунды)
+EDIT_CACHE_MAX_ENTRIES = 2000
+EDIT_COALESCE_WINDOW = 0.5
+
 # Состояния пользователя
 class States:
     """Состояния пользователя для машины состояний"""
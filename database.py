@@ -1,16 +1,26 @@
 # База данных для бота БЕЗ Persistent Disk (версия для Render.com)
 # БД хранится в /tmp (временная память, теряется при перезагрузке)
 
-import sqlite3
 import json
 import os
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 import threading
+import time
+
+from config import SESSION_CACHE_TTL, SESSION_CACHE_MAX_ENTRIES
+from db_pool import ConnectionPool
+from utils import date_to_iso, time_to_minutes
 
 logger = logging.getLogger(__name__)
 
+# События изменения совещаний (см. Database.subscribe)
+MEETING_ADDED = "meeting_added"
+MEETING_DELETED = "meeting_deleted"
+MEETINGS_PURGED = "meetings_purged"
+
 
 class Database:
     """Класс для работы с БД SQLite (БЕЗ диска)"""
@@ -22,7 +32,23 @@ class Database:
         db_path = os.getenv('DB_PATH', '/tmp/bot_database.db')
 
         self.db_path = db_path
-        self.local = threading.local()  # ✅ Локальное хранилище для каждого потока
+        self.pool = ConnectionPool(db_path)  # ✅ Ограниченный пул соединений (WAL)
+
+        # Кэш сессий (LRU): user_id -> (username или None, момент устаревания или None)
+        self.session_cache_ttl = SESSION_CACHE_TTL
+        self.session_cache_max_entries = SESSION_CACHE_MAX_ENTRIES
+        self._session_cache = OrderedDict()
+        self._session_generation = 0  # номер последнего изменения сессий (вход/выход)
+        self._session_cache_lock = threading.Lock()
+        self._session_cache_hits = 0
+        self._session_cache_misses = 0
+
+        # Версия данных о совещаниях: увеличивается при каждом изменении (для кэшей экранов)
+        self.data_version = 0
+        self._data_version_lock = threading.Lock()
+
+        # Подписчики на изменения совещаний (планировщик напоминаний и т.п.)
+        self._listeners = []
 
         logger.warning(f"⚠️ БД БЕЗ ДИСКА: {self.db_path}")
         logger.warning("⚠️ ВНИМАНИЕ: Данные теряются при перезагрузке сервиса!")
@@ -31,145 +57,520 @@ class Database:
         self._init_db()
         logger.info(f"✅ БД инициализирована (БЕЗ Persistent Disk)")
 
-    def _get_connection(self):
-        """Получить соединение с БД (для каждого потока своё)"""
-        # ✅ ИСПРАВЛЕНИЕ: Создаем новое соединение для каждого потока
-        if not hasattr(self.local, 'connection') or self.local.connection is None:
-            self.local.connection = sqlite3.connect(
-                self.db_path,
-                timeout=10,
-                check_same_thread=False  # ✅ Разрешаем использование в разных потоках
-            )
-        return self.local.connection
+    def _connection(self):
+        """Получить соединение из пула на время операции (with self._connection() as conn)"""
+        return self.pool.connection()
 
     def _init_db(self):
         """Инициализировать структуру БД"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        # Таблица пользователей и их сессий
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT NOT NULL,
-                login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            # Таблица пользователей и их сессий
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_sessions (
+                    user_id INTEGER PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Таблица совещаний
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meetings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    creator_username TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    duration_minutes INTEGER NOT NULL,
+                    participants TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    meeting_date TEXT
+                )
+            ''')
+
+            # Таблица уведомлений
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS notifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    meeting_id INTEGER NOT NULL,
+                    participant_username TEXT NOT NULL,
+                    read BOOLEAN DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (meeting_id) REFERENCES meetings(id)
+                )
+            ''')
+
+            # Таблица участников совещаний (нормализованная связь meetings <-> users)
+            # Интервал занятости хранится в минутах от начала календарного дня
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meeting_participants (
+                    meeting_id INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    meeting_date TEXT,
+                    start_minute INTEGER,
+                    end_minute INTEGER,
+                    PRIMARY KEY (meeting_id, username),
+                    FOREIGN KEY (meeting_id) REFERENCES meetings(id)
+                )
+            ''')
+
+            # Таблица состояний диалогов (черновики совещаний и т.п., см. state_store.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_states (
+                    user_id INTEGER PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+            # Архив прошедших и удалённых совещаний: только дописывается, в горячие
+            # выборки не попадает. Первые 8 колонок совпадают с meetings
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meetings_archive (
+                    id INTEGER PRIMARY KEY,
+                    creator_username TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    duration_minutes INTEGER NOT NULL,
+                    participants TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    meeting_date TEXT,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    reason TEXT NOT NULL
+                )
+            ''')
+
+            # Участники архивных совещаний. meeting_date может быть NULL (старые записи
+            # с некорректной датой), поэтому в ключ не входит - для поиска по
+            # (участник, дата) есть отдельный индекс
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS meeting_participants_archive (
+                    username TEXT NOT NULL,
+                    meeting_id INTEGER NOT NULL,
+                    meeting_date TEXT,
+                    PRIMARY KEY (username, meeting_id)
+                ) WITHOUT ROWID
+            ''')
+
+            self._migrate(cursor)
+
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meeting_participants_username '
+                'ON meeting_participants (username, meeting_id)'
             )
-        ''')
-
-        # Таблица совещаний
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS meetings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                creator_username TEXT NOT NULL,
-                date TEXT NOT NULL,
-                start_time TEXT NOT NULL,
-                duration_minutes INTEGER NOT NULL,
-                participants TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            # Индекс для поиска пересечений: (участник, день, начало) -> конец
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meeting_participants_busy '
+                'ON meeting_participants (username, meeting_date, start_minute, end_minute)'
             )
-        ''')
-
-        # Таблица уведомлений
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                meeting_id INTEGER NOT NULL,
-                participant_username TEXT NOT NULL,
-                read BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (meeting_id) REFERENCES meetings(id)
+            # Индексы для выборок совещаний по диапазону дат
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meetings_date '
+                'ON meetings (meeting_date, start_time)'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meetings_creator_date '
+                'ON meetings (creator_username, meeting_date, start_time)'
+            )
+            # Индексы для рассылки уведомлений: непрочитанные по порядку и поиск user_id по имени
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_notifications_unread '
+                'ON notifications (id) WHERE read = 0'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_notifications_meeting '
+                'ON notifications (meeting_id)'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_user_sessions_username '
+                'ON user_sessions (username)'
+            )
+            # Индексы архива для истории по создателю, участнику и по диапазону дат
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meeting_participants_archive_date '
+                'ON meeting_participants_archive (username, meeting_date)'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meetings_archive_creator_date '
+                'ON meetings_archive (creator_username, meeting_date, start_time)'
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_meetings_archive_date '
+                'ON meetings_archive (meeting_date, start_time)'
             )
-        ''')
 
-        conn.commit()
-        logger.info("✅ Структура БД инициализирована")
+            conn.commit()
+            logger.info("✅ Структура БД инициализирована")
+
+    def _migrate(self, cursor):
+        """Одноразовые миграции данных (версия схемы хранится в PRAGMA user_version)"""
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+
+        if version < 1:
+            # Переносим участников из JSON-колонки meetings.participants в meeting_participants
+            cursor.execute('SELECT id, participants FROM meetings')
+            rows = []
+            for meeting_id, participants_json in cursor.fetchall():
+                try:
+                    participants = json.loads(participants_json)
+                except (TypeError, ValueError):
+                    logger.warning(f"⚠️ Совещание {meeting_id}: некорректный список участников")
+                    continue
+                rows.extend((meeting_id, username) for username in participants)
+
+            cursor.executemany(
+                'INSERT OR IGNORE INTO meeting_participants (meeting_id, username) VALUES (?, ?)',
+                rows
+            )
+            cursor.execute('PRAGMA user_version = 1')
+            logger.info(f"✅ Миграция 1: перенесено участников: {len(rows)}")
+
+        if version < 2:
+            # Заполняем интервалы занятости участников (календарная дата + минуты)
+            self._add_column_if_missing(cursor, 'meeting_participants', 'meeting_date', 'TEXT')
+            self._add_column_if_missing(cursor, 'meeting_participants', 'start_minute', 'INTEGER')
+            self._add_column_if_missing(cursor, 'meeting_participants', 'end_minute', 'INTEGER')
+
+            cursor.execute('SELECT id, date, start_time, duration_minutes, created_at FROM meetings')
+            rows = []
+            for meeting_id, date, start_time, duration_minutes, created_at in cursor.fetchall():
+                try:
+                    meeting_date = self._legacy_meeting_date(date, created_at)
+                    start_minute = time_to_minutes(start_time)
+                except ValueError:
+                    logger.warning(f"⚠️ Совещание {meeting_id}: некорректная дата или время")
+                    continue
+                rows.append((meeting_date, start_minute, start_minute + duration_minutes, meeting_id))
+
+            cursor.executemany(
+                '''UPDATE meeting_participants
+                   SET meeting_date = ?, start_minute = ?, end_minute = ?
+                   WHERE meeting_id = ?''',
+                rows
+            )
+            cursor.execute('PRAGMA user_version = 2')
+            logger.info(f"✅ Миграция 2: заполнены интервалы для совещаний: {len(rows)}")
+
+        if version < 3:
+            # Календарная дата совещания (ГГГГ-ММ-ДД) вместо сравнения строк ДД.ММ
+            self._add_column_if_missing(cursor, 'meetings', 'meeting_date', 'TEXT')
+
+            cursor.execute('SELECT id, date, created_at FROM meetings WHERE meeting_date IS NULL')
+            rows = []
+            for meeting_id, date, created_at in cursor.fetchall():
+                try:
+                    rows.append((self._legacy_meeting_date(date, created_at), meeting_id))
+                except ValueError:
+                    logger.warning(f"⚠️ Совещание {meeting_id}: некорректная дата {date}")
+
+            cursor.executemany('UPDATE meetings SET meeting_date = ? WHERE id = ?', rows)
+            cursor.execute('PRAGMA user_version = 3')
+            logger.info(f"✅ Миграция 3: заполнены даты для совещаний: {len(rows)}")
+
+        if version < 4:
+            # meeting_date убрана из ключа участников архива: в таблице WITHOUT ROWID
+            # колонки ключа NOT NULL, и INSERT OR IGNORE молча терял участников
+            # совещаний без даты. Пересоздаём таблицу и восстанавливаем потерянных
+            # участников из JSON-колонки архива
+            cursor.execute('PRAGMA table_info(meeting_participants_archive)')
+            if any(row[1] == 'meeting_date' and row[5] for row in cursor.fetchall()):
+                cursor.execute('ALTER TABLE meeting_participants_archive RENAME TO meeting_participants_archive_old')
+                cursor.execute('''
+                    CREATE TABLE meeting_participants_archive (
+                        username TEXT NOT NULL,
+                        meeting_id INTEGER NOT NULL,
+                        meeting_date TEXT,
+                        PRIMARY KEY (username, meeting_id)
+                    ) WITHOUT ROWID
+                ''')
+                cursor.execute(
+                    '''INSERT INTO meeting_participants_archive (username, meeting_id, meeting_date)
+                       SELECT username, meeting_id, meeting_date FROM meeting_participants_archive_old'''
+                )
+                cursor.execute('DROP TABLE meeting_participants_archive_old')
+
+            cursor.execute('SELECT id, participants FROM meetings_archive WHERE meeting_date IS NULL')
+            rows = []
+            for meeting_id, participants_json in cursor.fetchall():
+                try:
+                    participants = json.loads(participants_json)
+                except (TypeError, ValueError):
+                    logger.warning(f"⚠️ Архивное совещание {meeting_id}: некорректный список участников")
+                    continue
+                rows.extend((username, meeting_id) for username in participants)
+
+            cursor.executemany(
+                'INSERT OR IGNORE INTO meeting_participants_archive (username, meeting_id) VALUES (?, ?)',
+                rows
+            )
+            cursor.execute('PRAGMA user_version = 4')
+            logger.info(f"✅ Миграция 4: восстановлено участников архива без даты: {len(rows)}")
+
+    @staticmethod
+    def _add_column_if_missing(cursor, table, column, declaration):
+        """Добавить колонку в таблицу, если её ещё нет"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+    @staticmethod
+    def _legacy_meeting_date(date, created_at):
+        """
+        Календарная дата ГГГГ-ММ-ДД для совещания из старой схемы (ДД.ММ без года)
+
+        Год отсчитывается от created_at, а не от сегодняшнего дня, иначе прошедшее
+        совещание уехало бы в следующий год. Если created_at нет - от текущего дня.
+        """
+        try:
+            created = datetime.fromisoformat(created_at) if created_at else None
+        except (TypeError, ValueError):
+            created = None
+        return date_to_iso(date, now=created)
+
+    @staticmethod
+    def _meeting_interval(date, start_time, duration_minutes):
+        """Перевести (ДД.ММ, ЧЧ:ММ, длительность) в (ГГГГ-ММ-ДД, начало, конец) в минутах"""
+        start_minute = time_to_minutes(start_time)
+        return date_to_iso(date), start_minute, start_minute + duration_minutes
+
+    def subscribe(self, listener):
+        """
+        Подписаться на изменения совещаний
+
+        listener(event, meeting_id) вызывается после commit в потоке, изменившем
+        данные, поэтому должен работать быстро. События: MEETING_ADDED,
+        MEETING_DELETED, MEETINGS_PURGED (meeting_id = None).
+        """
+        self._listeners.append(listener)
+
+    def _meetings_changed(self, event, meeting_id=None):
+        """Отметить изменение совещаний: увеличить data_version и оповестить подписчиков"""
+        with self._data_version_lock:
+            self.data_version += 1
+
+        for listener in list(self._listeners):
+            try:
+                listener(event, meeting_id)
+            except Exception as e:
+                logger.error(f"❌ Ошибка в подписчике на изменения совещаний: {e}")
 
     # ======================== СЕССИИ ========================
 
+    def _cache_session(self, user_id, username, generation=None):
+        """
+        Запомнить сессию в кэше (username = None - пользователь не в сессии)
+
+        Args:
+            generation: для результата чтения из БД - _session_generation до чтения;
+                если сессии с тех пор менялись, результат мог устареть и не кэшируется.
+                None - запись после изменения сессии в БД
+        """
+        expires_at = time.monotonic() + self.session_cache_ttl if self.session_cache_ttl else None
+        with self._session_cache_lock:
+            if generation is None:
+                self._session_generation += 1
+            elif generation != self._session_generation:
+                return
+            self._session_cache[user_id] = (username, expires_at)
+            self._session_cache.move_to_end(user_id)
+            while len(self._session_cache) > self.session_cache_max_entries:
+                self._session_cache.popitem(last=False)
+
+    def invalidate_session_cache(self, user_id=None):
+        """Сбросить кэш сессии пользователя (или весь кэш, если user_id не указан)"""
+        with self._session_cache_lock:
+            if user_id is None:
+                self._session_cache.clear()
+            else:
+                self._session_cache.pop(user_id, None)
+
     def add_user_session(self, user_id, username):
         """Добавить пользователя в сессию"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            # Проверяем, не в сессии ли уже
-            cursor.execute('SELECT user_id FROM user_sessions WHERE user_id = ?', (user_id,))
-            if cursor.fetchone():
-                logger.warning(f"⚠️ Пользователь {user_id} уже в сессии")
-                return False
+                # Проверяем, не в сессии ли уже
+                cursor.execute('SELECT user_id FROM user_sessions WHERE user_id = ?', (user_id,))
+                if cursor.fetchone():
+                    logger.warning(f"⚠️ Пользователь {user_id} уже в сессии")
+                    return False
 
-            cursor.execute(
-                'INSERT INTO user_sessions (user_id, username) VALUES (?, ?)',
-                (user_id, username)
-            )
-            conn.commit()
-            logger.info(f"✅ Пользователь {username} добавлен в сессию")
-            return True
+                cursor.execute(
+                    'INSERT INTO user_sessions (user_id, username) VALUES (?, ?)',
+                    (user_id, username)
+                )
+                conn.commit()
+                self._cache_session(user_id, username)
+                logger.info(f"✅ Пользователь {username} добавлен в сессию")
+                return True
         except Exception as e:
             logger.error(f"❌ Ошибка при добавлении сессии: {e}")
             return False
 
     def get_user_session(self, user_id):
-        """Получить пользователя из сессии"""
+        """Получить пользователя из сессии (сначала из кэша, затем из БД)"""
+        with self._session_cache_lock:
+            cached = self._session_cache.get(user_id)
+            if cached is not None and (cached[1] is None or cached[1] > time.monotonic()):
+                self._session_cache.move_to_end(user_id)
+                self._session_cache_hits += 1
+                return cached[0]
+            self._session_cache_misses += 1
+            generation = self._session_generation
+
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT username FROM user_sessions WHERE user_id = ?', (user_id,))
-            result = cursor.fetchone()
+                cursor.execute('SELECT username FROM user_sessions WHERE user_id = ?', (user_id,))
+                result = cursor.fetchone()
 
-            return result[0] if result else None
+                username = result[0] if result else None
+                self._cache_session(user_id, username, generation)
+                return username
         except Exception as e:
             logger.error(f"❌ Ошибка при получении сессии: {e}")
             return None
 
+    def get_user_ids_by_usernames(self, usernames):
+        """Получить Telegram user_id вошедших в бота пользователей по их именам"""
+        usernames = list(usernames)
+        if not usernames:
+            return []
+
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                placeholders = ', '.join('?' * len(usernames))
+                cursor.execute(
+                    f'SELECT user_id FROM user_sessions WHERE username IN ({placeholders})',
+                    usernames
+                )
+                return [user_id for (user_id,) in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении user_id пользователей: {e}")
+            return []
+
     def remove_user_session(self, user_id):
         """Удалить пользователя из сессии"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
-            conn.commit()
-            logger.info(f"✅ Пользователь {user_id} удален из сессии")
-            return True
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
+                conn.commit()
+                self._cache_session(user_id, None)
+                logger.info(f"✅ Пользователь {user_id} удален из сессии")
+                return True
         except Exception as e:
             logger.error(f"❌ Ошибка при удалении сессии: {e}")
             return False
 
     # ======================== СОВЕЩАНИЯ ========================
 
+    def _insert_meeting(self, cursor, creator_username, date, start_time, duration_minutes, participants):
+        """Вставить совещание и его участников (без commit, внутри текущей транзакции)"""
+        meeting_date, start_minute, end_minute = self._meeting_interval(date, start_time, duration_minutes)
+
+        cursor.execute(
+            '''INSERT INTO meetings 
+               (creator_username, date, start_time, duration_minutes, participants, meeting_date) 
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            (creator_username, date, start_time, duration_minutes, json.dumps(participants), meeting_date)
+        )
+        meeting_id = cursor.lastrowid
+
+        cursor.executemany(
+            '''INSERT OR IGNORE INTO meeting_participants
+               (meeting_id, username, meeting_date, start_minute, end_minute)
+               VALUES (?, ?, ?, ?, ?)''',
+            [(meeting_id, username, meeting_date, start_minute, end_minute) for username in participants]
+        )
+        return meeting_id
+
     def add_meeting(self, creator_username, date, start_time, duration_minutes, participants):
         """Добавить новое совещание"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                # Совещание и его участники записываются одной транзакцией
+                try:
+                    meeting_id = self._insert_meeting(
+                        cursor, creator_username, date, start_time, duration_minutes, participants
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                self._meetings_changed(MEETING_ADDED, meeting_id)
+                logger.info(f"✅ Совещание {meeting_id} создано")
+                return meeting_id
+        except Exception as e:
+            logger.error(f"❌ Ошибка при создании совещания: {e}")
+            return None
 
-            participants_json = json.dumps(participants)
+    def create_meeting_with_notifications(self, creator_username, date, start_time, duration_minutes,
+                                          participants):
+        """
+        Атомарно создать совещание, его участников и уведомления
 
-            cursor.execute(
-                '''INSERT INTO meetings 
-                   (creator_username, date, start_time, duration_minutes, participants) 
-                   VALUES (?, ?, ?, ?, ?)''',
-                (creator_username, date, start_time, duration_minutes, participants_json)
-            )
-            conn.commit()
+        Транзакция открывается с BEGIN IMMEDIATE, поэтому повторная проверка занятости
+        и вставка выполняются под блокировкой записи: два создателя не смогут
+        одновременно занять одного участника.
+
+        Returns:
+            кортеж (meeting_id, busy): meeting_id = None, если совещание не создано;
+            busy - участники, оказавшиеся заняты к моменту сохранения
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                meeting_date, start_minute, end_minute = self._meeting_interval(
+                    date, start_time, duration_minutes
+                )
 
-            meeting_id = cursor.lastrowid
-            logger.info(f"✅ Совещание {meeting_id} создано")
-            return meeting_id
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    busy = self._find_busy(cursor, participants, meeting_date, start_minute, end_minute)
+                    if busy:
+                        conn.rollback()
+                        logger.warning(f"⚠️ Совещание не создано, участники заняты: {busy}")
+                        return None, busy
+
+                    meeting_id = self._insert_meeting(
+                        cursor, creator_username, date, start_time, duration_minutes, participants
+                    )
+                    cursor.executemany(
+                        'INSERT INTO notifications (meeting_id, participant_username) VALUES (?, ?)',
+                        [(meeting_id, username) for username in participants]
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                self._meetings_changed(MEETING_ADDED, meeting_id)
+                logger.info(f"✅ Совещание {meeting_id} создано, уведомлений: {len(participants)}")
+                return meeting_id, []
         except Exception as e:
-            logger.error(f"❌ Ошибка при создании совещания: {e}")
-            return None
+            logger.error(f"❌ Ошибка при создании совещания с уведомлениями: {e}")
+            return None, []
 
     def get_all_meetings(self):
         """Получить все совещания"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT * FROM meetings ORDER BY date, start_time')
-            return cursor.fetchall()
+                cursor.execute('SELECT * FROM meetings ORDER BY meeting_date, start_time')
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"❌ Ошибка при получении совещаний: {e}")
             return []
@@ -177,176 +578,419 @@ class Database:
     def get_meetings_by_creator(self, creator_username):
         """Получить совещания создателя"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute(
-                'SELECT * FROM meetings WHERE creator_username = ? ORDER BY date, start_time',
-                (creator_username,)
-            )
-            return cursor.fetchall()
+                cursor.execute(
+                    'SELECT * FROM meetings WHERE creator_username = ? ORDER BY meeting_date, start_time',
+                    (creator_username,)
+                )
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"❌ Ошибка при получении совещаний: {e}")
             return []
 
-    def get_meetings_by_participant(self, participant_username):
-        """Получить совещания участника"""
+    def get_meetings_between(self, date_from, date_to, creator_username=None):
+        """
+        Получить совещания в диапазоне дат (включительно)
+
+        Args:
+            date_from, date_to: даты в формате ГГГГ-ММ-ДД
+            creator_username: если указан - только совещания этого создателя
+        """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                if creator_username:
+                    cursor.execute(
+                        '''SELECT * FROM meetings
+                           WHERE creator_username = ? AND meeting_date BETWEEN ? AND ?
+                           ORDER BY meeting_date, start_time''',
+                        (creator_username, date_from, date_to)
+                    )
+                else:
+                    cursor.execute(
+                        '''SELECT * FROM meetings
+                           WHERE meeting_date BETWEEN ? AND ?
+                           ORDER BY meeting_date, start_time''',
+                        (date_from, date_to)
+                    )
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении совещаний за период: {e}")
+            return []
+
+    def iter_meetings_between(self, date_from, date_to, batch_size=50):
+        """
+        Перебрать совещания в диапазоне дат (включительно) по порядку, порциями
 
-            # Получаем все совещания и фильтруем по участникам
-            cursor.execute('SELECT * FROM meetings ORDER BY date, start_time')
-            all_meetings = cursor.fetchall()
+        В отличие от get_meetings_between не читает всё сразу: если перебор
+        прервать (страница заполнена), остальные строки не выбираются. Генератор
+        держит соединение из пула до конца перебора или до close().
+
+        Args:
+            date_from, date_to: даты в формате ГГГГ-ММ-ДД
+            batch_size: сколько строк читать за раз
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute(
+                    '''SELECT * FROM meetings
+                       WHERE meeting_date BETWEEN ? AND ?
+                       ORDER BY meeting_date, start_time''',
+                    (date_from, date_to)
+                )
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении совещаний за период: {e}")
 
-            result = []
-            for meeting in all_meetings:
-                participants = json.loads(meeting[5])
-                if participant_username in participants:
-                    result.append(meeting)
+    def get_meetings_by_participant(self, participant_username, date_from=None, date_to=None):
+        """
+        Получить совещания участника
 
-            return result
+        Args:
+            participant_username: имя участника
+            date_from, date_to: необязательный диапазон дат ГГГГ-ММ-ДД (включительно)
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                conditions = ['p.username = ?']
+                params = [participant_username]
+                if date_from:
+                    conditions.append('p.meeting_date >= ?')
+                    params.append(date_from)
+                if date_to:
+                    conditions.append('p.meeting_date <= ?')
+                    params.append(date_to)
+
+                # Индексный поиск по таблице участников вместо перебора всех совещаний
+                cursor.execute(
+                    f'''SELECT m.* FROM meeting_participants p
+                        JOIN meetings m ON m.id = p.meeting_id
+                        WHERE {' AND '.join(conditions)}
+                        ORDER BY m.meeting_date, m.start_time''',
+                    params
+                )
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"❌ Ошибка при получении совещаний участника: {e}")
             return []
 
     def get_past_meetings(self, creator_username=None):
-        """Получить прошедшие совещания"""
+        """Получить прошедшие совещания (дата раньше сегодняшней)"""
         try:
-            today = datetime.now().strftime("%d.%m")
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            today = datetime.now().strftime("%Y-%m-%d")
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                if creator_username:
+                    cursor.execute(
+                        '''SELECT * FROM meetings WHERE creator_username = ? AND meeting_date < ?
+                           ORDER BY meeting_date DESC, start_time DESC''',
+                        (creator_username, today)
+                    )
+                else:
+                    cursor.execute(
+                        'SELECT * FROM meetings WHERE meeting_date < ? ORDER BY meeting_date DESC, start_time DESC',
+                        (today,)
+                    )
+
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении прошедших совещаний: {e}")
+            return []
+
+    def get_future_meetings(self, creator_username):
+        """Получить будущие совещания (начиная с сегодняшнего дня)"""
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            if creator_username:
                 cursor.execute(
-                    'SELECT * FROM meetings WHERE creator_username = ? AND date < ? ORDER BY date DESC',
+                    '''SELECT * FROM meetings WHERE creator_username = ? AND meeting_date >= ?
+                       ORDER BY meeting_date, start_time''',
                     (creator_username, today)
                 )
-            else:
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении будущих совещаний: {e}")
+            return []
+
+    def get_upcoming_meetings(self):
+        """Получить совещания начиная с сегодняшнего дня (для планировщика напоминаний)"""
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
                 cursor.execute(
-                    'SELECT * FROM meetings WHERE date < ? ORDER BY date DESC',
+                    'SELECT * FROM meetings WHERE meeting_date >= ? ORDER BY meeting_date, start_time',
                     (today,)
                 )
-
-            return cursor.fetchall()
+                return cursor.fetchall()
         except Exception as e:
-            logger.error(f"❌ Ошибка при получении прошедших совещаний: {e}")
+            logger.error(f"❌ Ошибка при получении предстоящих совещаний: {e}")
             return []
 
-    def get_future_meetings(self, creator_username):
-        """Получить будущие совещания"""
+    def get_earliest_meeting_date(self):
+        """Самая ранняя дата совещания (ГГГГ-ММ-ДД) или None, если совещаний нет - по индексу дат"""
         try:
-            today = datetime.now().strftime("%d.%m")
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute(
-                'SELECT * FROM meetings WHERE creator_username = ? AND date >= ? ORDER BY date',
-                (creator_username, today)
-            )
-            return cursor.fetchall()
+                cursor.execute('SELECT MIN(meeting_date) FROM meetings')
+                return cursor.fetchone()[0]
         except Exception as e:
-            logger.error(f"❌ Ошибка при получении будущих совещаний: {e}")
-            return []
+            logger.error(f"❌ Ошибка при получении ближайшей даты совещаний: {e}")
+            return None
 
     def get_meeting_by_id(self, meeting_id):
         """Получить совещание по ID"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT * FROM meetings WHERE id = ?', (meeting_id,))
-            return cursor.fetchone()
+                cursor.execute('SELECT * FROM meetings WHERE id = ?', (meeting_id,))
+                return cursor.fetchone()
         except Exception as e:
             logger.error(f"❌ Ошибка при получении совещания: {e}")
             return None
 
     def delete_meeting(self, meeting_id):
-        """Удалить совещание"""
+        """Удалить совещание (оно переносится в архив, см. get_meeting_history)"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            # Удаляем уведомления
-            cursor.execute('DELETE FROM notifications WHERE meeting_id = ?', (meeting_id,))
+                try:
+                    self._archive_meetings(cursor, 'm.id = ?', (meeting_id,), 'deleted')
 
-            # Удаляем совещание
-            cursor.execute('DELETE FROM meetings WHERE id = ?', (meeting_id,))
+                    # Удаляем уведомления
+                    cursor.execute('DELETE FROM notifications WHERE meeting_id = ?', (meeting_id,))
 
-            conn.commit()
-            logger.info(f"✅ Совещание {meeting_id} удалено")
-            return True
+                    # Удаляем участников
+                    cursor.execute('DELETE FROM meeting_participants WHERE meeting_id = ?', (meeting_id,))
+
+                    # Удаляем совещание
+                    cursor.execute('DELETE FROM meetings WHERE id = ?', (meeting_id,))
+
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                self._meetings_changed(MEETING_DELETED, meeting_id)
+                logger.info(f"✅ Совещание {meeting_id} удалено")
+                return True
         except Exception as e:
             logger.error(f"❌ Ошибка при удалении совещания: {e}")
             return False
 
-    def check_user_availability(self, username, date, start_time, duration):
-        """Проверить свободен ли пользователь"""
+    def _archive_meetings(self, cursor, where, params, reason):
+        """
+        Скопировать совещания, подходящие под условие where, и их участников в архив
+
+        Вызывается внутри транзакции удаления, до DELETE. where - условие SQL,
+        где колонки meetings указаны через псевдоним m (например, 'm.id = ?'):
+        в обоих запросах оно подставляется как есть.
+
+        Returns:
+            число перенесённых совещаний
+        """
+        cursor.execute(
+            f'''INSERT OR IGNORE INTO meetings_archive
+                (id, creator_username, date, start_time, duration_minutes, participants,
+                 created_at, meeting_date, reason)
+                SELECT id, creator_username, date, start_time, duration_minutes, participants,
+                       created_at, meeting_date, ?
+                FROM meetings m WHERE {where}''',
+            (reason, *params)
+        )
+        archived = cursor.rowcount
+
+        cursor.execute(
+            f'''INSERT OR IGNORE INTO meeting_participants_archive (username, meeting_id, meeting_date)
+                SELECT p.username, m.id, m.meeting_date
+                FROM meeting_participants p JOIN meetings m ON m.id = p.meeting_id
+                WHERE {where}''',
+            params
+        )
+        return archived
+
+    def purge_meetings_before(self, cutoff):
+        """
+        Перенести все совещания с датой раньше cutoff в архив, удалив уведомления
+
+        Выполняется одной транзакцией: два INSERT ... SELECT в архив и три DELETE
+        по индексу дат, поэтому горячая таблица meetings остаётся маленькой.
+
+        Args:
+            cutoff: дата ГГГГ-ММ-ДД (или date/datetime)
+
+        Returns:
+            словарь с количеством удалённых (и перенесённых в архив) строк по таблицам
+        """
+        if not isinstance(cutoff, str):
+            cutoff = cutoff.strftime("%Y-%m-%d")
+
+        counts = {'meetings': 0, 'notifications': 0, 'participants': 0, 'archived': 0}
         try:
-            # Парсим время
-            start_hour, start_min = map(int, start_time.split(':'))
-            duration_hours = duration // 60
-            duration_mins = duration % 60
-            end_hour = start_hour + duration_hours
-            end_min = start_min + duration_mins
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                old_meetings = 'SELECT id FROM meetings WHERE meeting_date < ?'
+                try:
+                    counts['archived'] = self._archive_meetings(cursor, 'm.meeting_date < ?', (cutoff,), 'expired')
+
+                    cursor.execute(
+                        f'DELETE FROM notifications WHERE meeting_id IN ({old_meetings})', (cutoff,)
+                    )
+                    counts['notifications'] = cursor.rowcount
+
+                    cursor.execute(
+                        f'DELETE FROM meeting_participants WHERE meeting_id IN ({old_meetings})', (cutoff,)
+                    )
+                    counts['participants'] = cursor.rowcount
+
+                    cursor.execute('DELETE FROM meetings WHERE meeting_date < ?', (cutoff,))
+                    counts['meetings'] = cursor.rowcount
+
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                if counts['meetings']:
+                    self._meetings_changed(MEETINGS_PURGED)
+                    logger.info(f"✅ Перенесено в архив совещаний до {cutoff}: {counts}")
+                return counts
+        except Exception as e:
+            logger.error(f"❌ Ошибка при массовом удалении совещаний: {e}")
+            return {'meetings': 0, 'notifications': 0, 'participants': 0, 'archived': 0}
 
-            if end_min >= 60:
-                end_hour += 1
-                end_min -= 60
+    # ======================== АРХИВ ========================
 
-            end_time = f"{end_hour:02d}:{end_min:02d}"
+    def get_meeting_history(self, creator_username=None, participant_username=None, date_from=None, date_to=None):
+        """
+        Получить архивные совещания (прошедшие и удалённые) по создателю и/или участнику
 
-            # Получаем все совещания на эту дату
-            all_meetings = self.get_all_meetings()
+        Строки имеют тот же формат, что и в meetings (первые 8 колонок), плюс
+        archived_at и reason ('expired' или 'deleted').
 
-            for meeting in all_meetings:
-                if meeting[2] != date:  # Не та дата
-                    continue
+        Args:
+            creator_username: если указан - только совещания этого создателя
+            participant_username: если указан - только совещания с этим участником
+            date_from, date_to: необязательный диапазон дат ГГГГ-ММ-ДД (включительно)
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                conditions = []
+                params = []
+                if participant_username:
+                    # Поиск по индексу (участник, дата) таблицы участников архива
+                    source = (
+                        'meeting_participants_archive p JOIN meetings_archive m ON m.id = p.meeting_id'
+                    )
+                    date_column = 'p.meeting_date'
+                    conditions.append('p.username = ?')
+                    params.append(participant_username)
+                else:
+                    source = 'meetings_archive m'
+                    date_column = 'm.meeting_date'
+                if creator_username:
+                    conditions.append('m.creator_username = ?')
+                    params.append(creator_username)
+                if date_from:
+                    conditions.append(f'{date_column} >= ?')
+                    params.append(date_from)
+                if date_to:
+                    conditions.append(f'{date_column} <= ?')
+                    params.append(date_to)
+
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+                cursor.execute(
+                    f'''SELECT m.* FROM {source} {where}
+                        ORDER BY m.meeting_date, m.start_time''',
+                    params
+                )
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении истории совещаний: {e}")
+            return []
 
-                # Проверяем участников
-                participants = json.loads(meeting[5])
-                if username not in participants:
-                    continue
+    def check_user_availability(self, username, date, start_time, duration):
+        """Проверить свободен ли пользователь"""
+        return self.check_users_availability([username], date, start_time, duration).get(username, True)
 
-                # Парсим время совещания
-                m_start = meeting[3]
-                m_start_hour, m_start_min = map(int, m_start.split(':'))
-                m_duration = meeting[4]
-                m_duration_hours = m_duration // 60
-                m_duration_mins = m_duration % 60
-                m_end_hour = m_start_hour + m_duration_hours
-                m_end_min = m_start_min + m_duration_mins
+    def check_users_availability(self, usernames, date, start_time, duration):
+        """
+        Проверить занятость сразу нескольких пользователей одним запросом
 
-                if m_end_min >= 60:
-                    m_end_hour += 1
-                    m_end_min -= 60
+        Интервалы полуоткрытые: [начало, конец). Совещание, заканчивающееся в 10:00,
+        не пересекается с совещанием, начинающимся в 10:00.
 
-                m_end_time = f"{m_end_hour:02d}:{m_end_min:02d}"
+        Returns:
+            словарь {username: True если свободен, False если занят}
+        """
+        usernames = list(usernames)
+        availability = {username: True for username in usernames}
+        if not usernames:
+            return availability
 
-                # Проверяем пересечение времени
-                if (start_time < m_end_time and end_time > m_start):
-                    return False  # Занят
+        try:
+            meeting_date, start_minute, end_minute = self._meeting_interval(date, start_time, duration)
+
+            with self._connection() as conn:
+                for username in self._find_busy(conn.cursor(), usernames, meeting_date, start_minute, end_minute):
+                    availability[username] = False
 
-            return True  # Свободен
+                return availability
         except Exception as e:
             logger.error(f"❌ Ошибка при проверке доступности: {e}")
-            return True  # На случай ошибки разрешаем
+            return availability  # На случай ошибки разрешаем
+
+    @staticmethod
+    def _find_busy(cursor, usernames, meeting_date, start_minute, end_minute):
+        """Пользователи из usernames, занятые в [start_minute, end_minute) дня meeting_date"""
+        if not usernames:
+            return []
+
+        placeholders = ', '.join('?' * len(usernames))
+        cursor.execute(
+            f'''SELECT DISTINCT username FROM meeting_participants
+                WHERE username IN ({placeholders})
+                  AND meeting_date = ?
+                  AND start_minute < ?
+                  AND end_minute > ?''',
+            (*usernames, meeting_date, end_minute, start_minute)
+        )
+        return [username for (username,) in cursor.fetchall()]
 
     # ======================== УВЕДОМЛЕНИЯ ========================
 
     def add_notification(self, meeting_id, participant_username):
         """Добавить уведомление участнику"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute(
-                'INSERT INTO notifications (meeting_id, participant_username) VALUES (?, ?)',
-                (meeting_id, participant_username)
-            )
-            conn.commit()
-            logger.info(f"✅ Уведомление добавлено {participant_username}")
-            return True
+                cursor.execute(
+                    'INSERT INTO notifications (meeting_id, participant_username) VALUES (?, ?)',
+                    (meeting_id, participant_username)
+                )
+                conn.commit()
+                logger.info(f"✅ Уведомление добавлено {participant_username}")
+                return True
         except Exception as e:
             logger.error(f"❌ Ошибка при добавлении уведомления: {e}")
             return False
@@ -354,53 +998,196 @@ class Database:
     def get_notifications(self, username):
         """Получить уведомления пользователя"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute(
-                '''SELECT n.*, m.* FROM notifications n
-                   JOIN meetings m ON n.meeting_id = m.id
-                   WHERE n.participant_username = ? AND n.read = 0''',
-                (username,)
-            )
-            return cursor.fetchall()
+                cursor.execute(
+                    '''SELECT n.*, m.* FROM notifications n
+                       JOIN meetings m ON n.meeting_id = m.id
+                       WHERE n.participant_username = ? AND n.read = 0''',
+                    (username,)
+                )
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"❌ Ошибка при получении уведомлений: {e}")
             return []
 
+    def get_pending_notifications(self, limit=50):
+        """
+        Получить пачку непрочитанных уведомлений, которые можно доставить
+
+        Берутся только уведомления участников, вошедших в бота (есть user_id
+        в user_sessions). Остальные ждут, пока участник не войдёт. Если под
+        одним именем вошли с нескольких аккаунтов Telegram, уведомление
+        получает последняя сессия - ровно одна строка на уведомление.
+
+        Returns:
+            список кортежей (notification_id, user_id, participant_username,
+            creator_username, date, start_time, duration_minutes, participants)
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute(
+                    '''SELECT n.id, s.user_id, n.participant_username,
+                              m.creator_username, m.date, m.start_time, m.duration_minutes, m.participants
+                       FROM notifications n
+                       JOIN meetings m ON m.id = n.meeting_id
+                       JOIN user_sessions s ON s.user_id = (
+                           SELECT user_id FROM user_sessions
+                           WHERE username = n.participant_username
+                           ORDER BY login_time DESC, user_id DESC
+                           LIMIT 1
+                       )
+                       WHERE n.read = 0
+                       ORDER BY n.id
+                       LIMIT ?''',
+                    (limit,)
+                )
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении уведомлений для рассылки: {e}")
+            return []
+
+    def mark_notifications_read(self, notification_ids):
+        """Отметить уведомления прочитанными (одной транзакцией)"""
+        if not notification_ids:
+            return 0
+
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.executemany(
+                    'UPDATE notifications SET read = 1 WHERE id = ?',
+                    [(notification_id,) for notification_id in set(notification_ids)]
+                )
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"❌ Ошибка при отметке уведомлений: {e}")
+            return 0
+
+    # ======================== СОСТОЯНИЯ ДИАЛОГОВ ========================
+
+    def save_conversation_states(self, items):
+        """
+        Сохранить состояния диалогов одной транзакцией
+
+        Args:
+            items: список кортежей (user_id, state_json, updated_at)
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO conversation_states (user_id, state, updated_at) VALUES (?, ?, ?)',
+                    items
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка при сохранении состояний диалогов: {e}")
+            return False
+
+    def load_conversation_state(self, user_id):
+        """Загрузить состояние диалога: (state_json, updated_at) или None"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute(
+                    'SELECT state, updated_at FROM conversation_states WHERE user_id = ?', (user_id,)
+                )
+                return cursor.fetchone()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при загрузке состояния диалога: {e}")
+            return None
+
+    def delete_conversation_states(self, user_ids):
+        """Удалить состояния диалогов пользователей"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.executemany(
+                    'DELETE FROM conversation_states WHERE user_id = ?', [(user_id,) for user_id in user_ids]
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка при удалении состояний диалогов: {e}")
+            return False
+
+    def purge_conversation_states_before(self, timestamp):
+        """Удалить состояния диалогов, не обновлявшиеся с момента timestamp"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('DELETE FROM conversation_states WHERE updated_at < ?', (timestamp,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"❌ Ошибка при очистке состояний диалогов: {e}")
+            return 0
+
     # ======================== ИНФОРМАЦИЯ ========================
 
     def get_database_info(self):
         """Получить информацию о БД"""
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT COUNT(*) FROM meetings')
-            meetings_count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM meetings')
+                meetings_count = cursor.fetchone()[0]
 
-            cursor.execute('SELECT COUNT(*) FROM notifications')
-            notifications_count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM notifications')
+                notifications_count = cursor.fetchone()[0]
 
-            cursor.execute('SELECT COUNT(*) FROM user_sessions')
-            sessions_count = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM user_sessions')
+                sessions_count = cursor.fetchone()[0]
 
-            db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+                cursor.execute('SELECT COUNT(*) FROM meetings_archive')
+                archived_count = cursor.fetchone()[0]
 
-            info = {
-                'meetings': meetings_count,
-                'notifications': notifications_count,
-                'sessions': sessions_count,
-                'database_size': db_size,
-                'storage': '❌ БЕЗ ДИСКА - данные теряются при перезагрузке!'
-            }
+                db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+
+                info = {
+                    'meetings': meetings_count,
+                    'notifications': notifications_count,
+                    'sessions': sessions_count,
+                    'archived_meetings': archived_count,
+                    'database_size': db_size,
+                    'storage': '❌ БЕЗ ДИСКА - данные теряются при перезагрузке!',
+                    'pool': self.pool.get_stats(),
+                    'session_cache': self.get_session_cache_stats()
+                }
 
-            logger.warning(f"⚠️ БД информация: {info}")
-            return info
+                logger.warning(f"⚠️ БД информация: {info}")
+                return info
         except Exception as e:
             logger.error(f"❌ Ошибка при получении информации о БД: {e}")
             return {}
 
+    def get_session_cache_stats(self):
+        """Статистика кэша сессий"""
+        with self._session_cache_lock:
+            return {
+                'size': len(self._session_cache),
+                'max_entries': self.session_cache_max_entries,
+                'hits': self._session_cache_hits,
+                'misses': self._session_cache_misses,
+                'ttl': self.session_cache_ttl,
+            }
+
+    def close(self):
+        """Закрыть соединения пула (при остановке бота)"""
+        self.pool.close_all()
+
 
 # Глобальный экземпляр БД
 db = Database()
\ No newline at end of file
@@ -0,0 +1,216 @@
+# db_pool.py
+# Пул соединений SQLite для Database
+
+import sqlite3
+import queue
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+from config import (
+    DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_BUSY_TIMEOUT_MS, DB_BUSY_RETRIES,
+    DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _is_busy_error(error):
+    """Ошибка блокировки БД другим соединением"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class PooledCursor(sqlite3.Cursor):
+    """Курсор, повторяющий запрос при блокировке БД"""
+
+    def execute(self, sql, parameters=()):
+        return self.connection.retry_busy(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.connection.retry_busy(super().executemany, sql, seq_of_parameters)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Соединение пула со своей статистикой"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {
+            'acquired': 0,          # сколько раз выдано из пула
+            'wait_time': 0.0,       # суммарное ожидание (пул + повторы при блокировке), сек
+            'busy_retries': 0,      # повторы запросов из-за блокировки БД
+        }
+
+    def cursor(self, factory=PooledCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        return self.retry_busy(super().commit)
+
+    def retry_busy(self, func, *args):
+        """Выполнить операцию, повторяя её при 'database is locked'"""
+        delay = 0.01
+        for attempt in range(DB_BUSY_RETRIES + 1):
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt == DB_BUSY_RETRIES:
+                    raise
+                self.stats['busy_retries'] += 1
+                self.stats['wait_time'] += delay
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+
+class ConnectionPool:
+    """
+    Ограниченный пул соединений SQLite (WAL + настроенные PRAGMA)
+
+    Соединения создаются лениво, не больше size штук, и переиспользуются.
+    Повторный запрос соединения в том же потоке (вложенный вызов методов
+    Database) возвращает уже выданное соединение.
+    """
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._connections = []
+        self._in_use = set()  # выданные соединения
+        self._retired = set()  # выданные на момент close_all() - закрываются при возврате
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._local = threading.local()
+
+    def _connect(self):
+        """Создать и настроить новое соединение"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # соединение переходит между потоками через пул
+            factory=PooledConnection
+        )
+        conn.execute('PRAGMA journal_mode=WAL')  # читатели не блокируются писателем
+        conn.execute('PRAGMA synchronous=NORMAL')  # в WAL безопасно и без fsync на каждый commit
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+        return conn
+
+    def acquire(self):
+        """Взять соединение из пула (создать новое, если лимит не исчерпан)"""
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._connections) < self.size:
+                    conn = self._connect()
+                    self._connections.append(conn)
+                    logger.info(f"🔌 Открыто соединение с БД ({len(self._connections)}/{self.size})")
+
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"пул соединений исчерпан: ожидание дольше {self.timeout} сек"
+                    )
+
+        with self._lock:
+            self._in_use.add(conn)
+        conn.stats['acquired'] += 1
+        conn.stats['wait_time'] += time.perf_counter() - started
+        return conn
+
+    def release(self, conn):
+        """Вернуть соединение в пул (незавершённая транзакция откатывается)"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            self._in_use.discard(conn)
+            retired = conn in self._retired
+            if retired:
+                # Пул закрывали, пока соединение было выдано - закрываем его сейчас
+                self._retired.discard(conn)
+                self._connections.remove(conn)
+                self._released.notify_all()
+
+        if retired:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: соединение на время одной операции Database"""
+        held = getattr(self._local, 'connection', None)
+        if held is not None:
+            # Вложенный вызов в том же потоке - используем то же соединение
+            yield held
+            return
+
+        conn = self.acquire()
+        self._local.connection = conn
+        try:
+            yield conn
+        finally:
+            self._local.connection = None
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Закрыть все соединения
+
+        Свободные закрываются сразу, выданные - при возврате в пул; их возврата
+        ждём не дольше timeout пула.
+        """
+        with self._lock:
+            self._retired.update(self._in_use)
+
+        closed = 0
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+            closed += 1
+
+        with self._released:
+            busy = len(self._retired)
+            self._released.wait_for(lambda: not self._retired, timeout=self.timeout)
+            pending = len(self._retired)
+
+        closed += busy - pending
+        if pending:
+            logger.warning(f"⚠️ Соединений с БД ещё используется: {pending}, закроются при возврате в пул")
+        logger.info(f"🔌 Закрыто соединений с БД: {closed}")
+
+    def get_stats(self):
+        """Статистика пула и каждого соединения"""
+        with self._lock:
+            connections = list(self._connections)
+        return {
+            'size': self.size,
+            'open': len(connections),
+            'in_use': len(self._in_use),
+            'idle': self._idle.qsize(),
+            'connections': [
+                {
+                    'acquired': conn.stats['acquired'],
+                    'wait_time_ms': round(conn.stats['wait_time'] * 1000, 2),
+                    'busy_retries': conn.stats['busy_retries'],
+                }
+                for conn in connections
+            ],
+        }
@@ -0,0 +1,87 @@
+# http_client.py
+# Общая HTTP-сессия с пулом соединений для Telegram Bot API и Keep-Alive
+
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.util.retry import Retry
+
+from config import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API = "https://api.telegram.org"
+
+
+class HttpClient:
+    """
+    Одна requests.Session на весь процесс
+
+    Соединения (TCP + TLS) переиспользуются между запросами и потоками вместо
+    новой сессии на каждый поток telebot и нового соединения на каждый пинг
+    Keep-Alive. Для Bot API повторяются только ошибки соединения: повтор POST
+    после ответа сервера мог бы отправить сообщение дважды. Остальные адреса
+    (пинг своего сервиса) повторяются и при 502/503/504.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+        """
+        Args:
+            pool_size: максимум открытых соединений к одному хосту
+            retries: число повторов при ошибках соединения
+            backoff: множитель паузы между повторами (секунды)
+        """
+        self.session = requests.Session()
+
+        self._adapters = {
+            TELEGRAM_API: HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size,
+                max_retries=Retry(total=retries, connect=retries, read=0, status=0, backoff_factor=backoff)
+            ),
+            "https://": HTTPAdapter(
+                pool_connections=4, pool_maxsize=pool_size,
+                max_retries=Retry(total=retries, backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                                  allowed_methods=("GET", "HEAD"))
+            ),
+        }
+        self._adapters["http://"] = self._adapters["https://"]
+        for prefix, adapter in self._adapters.items():
+            self.session.mount(prefix, adapter)
+
+    def request(self, method, url, **kwargs):
+        """Выполнить запрос через общую сессию"""
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        """GET через общую сессию"""
+        return self.request("GET", url, **kwargs)
+
+    def install_telebot(self):
+        """Использовать эту сессию для всех запросов telebot (вместо сессии на каждый поток)"""
+        apihelper.session = self.session
+        apihelper.SESSION_TIME_TO_LIVE = None
+        logger.info("🔌 Telegram API использует общий пул соединений")
+
+    def get_stats(self):
+        """Статистика: сколько соединений открыто и сколько запросов прошло по уже открытым"""
+        connections = 0
+        pool_requests = 0
+        for adapter in set(self._adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+        return {
+            'requests': pool_requests,
+            'connections_opened': connections,
+            'connections_reused': max(0, pool_requests - connections),
+        }
+
+
+# Глобальный экземпляр
+http_client = HttpClient()
@@ -1,33 +1,60 @@
 # keep_alive.py
 # Keep-Alive сервис для Render
-# Отправляет фиктивные запросы каждую минуту, чтобы бот не отключался
+# Отправляет фиктивный запрос, только когда сервис долго простаивает и скоро уснёт
 # Работает в отдельном потоке, не мешает пользователям
 
 import requests
 import time
 import logging
 import os
+import random
 import threading
 from datetime import datetime
 
+from config import KEEP_ALIVE_SLEEP_AFTER, KEEP_ALIVE_MARGIN, KEEP_ALIVE_JITTER
+from http_client import http_client
+
 logger = logging.getLogger(__name__)
 
 class KeepAlive:
-    """Класс для поддержания активности бота на Render"""
+    """
+    Класс для поддержания активности бота на Render
+
+    Render усыпляет сервис, если к нему долго нет входящих запросов. Пока
+    пользователи пишут боту (webhook - это входящие запросы), пинговать
+    незачем: main отмечает каждое обновление через mark_activity(), и пинг
+    отправляется, только когда с последней активности (или пинга) прошло
+    почти sleep_after секунд.
+    """
     
-    def __init__(self, bot_url=None, interval=60):
+    def __init__(self, bot_url=None, interval=60, sleep_after=KEEP_ALIVE_SLEEP_AFTER,
+                 margin=KEEP_ALIVE_MARGIN, jitter=KEEP_ALIVE_JITTER, clock=time.monotonic):
         """
         Инициализация Keep-Alive сервиса
         
         Args:
             bot_url: URL сервиса на Render (опционально, может быть None для локального)
-            interval: интервал проверки в секундах (по умолчанию 60 сек = 1 минута)
+            interval: максимальный интервал проверки в секундах (по умолчанию 60 сек = 1 минута)
+            sleep_after: через сколько секунд без входящих запросов сервис засыпает
+            margin: за сколько секунд до засыпания отправлять пинг
+            jitter: доля случайного сокращения паузы между проверками
+            clock: источник времени (для тестов)
         """
         self.bot_url = bot_url
         self.interval = interval
+        self.sleep_after = sleep_after
+        self.margin = margin
+        self.jitter = jitter
+        self.clock = clock
         self.running = False
         self.thread = None
         self.request_count = 0
+        self.skipped_count = 0
+        self.failed_count = 0
+
+        self.last_activity = clock()  # последнее входящее обновление или успешный пинг
+        self.retry_at = None  # когда повторить пинг после ошибки
+        self._stop_event = threading.Event()
         
         logger.info("🔄 Keep-Alive сервис инициализирован")
     
@@ -38,25 +65,52 @@ class KeepAlive:
             return
         
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._keep_alive_loop, daemon=True)
         self.thread.start()
         
         logger.info(f"✅ Keep-Alive запущен (интервал: {self.interval} сек)")
     
     def stop(self):
-        """Остановить Keep-Alive"""
+        """Остановить Keep-Alive (поток просыпается сразу, а не после очередной паузы)"""
         self.running = False
+        self._stop_event.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
         logger.info("🛑 Keep-Alive остановлен")
+
+    def mark_activity(self):
+        """Отметить входящий запрос: сервис активен, пинг откладывается"""
+        self.last_activity = self.clock()
+
+    def seconds_until_ping(self):
+        """Сколько секунд осталось до момента, когда нужен пинг (<= 0 - пора)"""
+        due = self.last_activity + self.sleep_after - self.margin
+        if self.retry_at is not None:
+            due = max(due, self.retry_at)
+        return due - self.clock()
+
+    def next_delay(self):
+        """Пауза до следующей проверки: не дольше interval и не позже срока пинга"""
+        delay = min(self.interval, max(0.0, self.seconds_until_ping()))
+        # Сдвиг только в сторону уменьшения - проверка никогда не опаздывает
+        return delay * (1 - random.uniform(0, self.jitter))
+
+    def check(self):
+        """Отправить пинг, если сервис скоро уснёт; иначе пропустить проверку"""
+        if self.seconds_until_ping() > 0:
+            self.skipped_count += 1
+            return False
+        self._send_ping()
+        return True
     
     def _keep_alive_loop(self):
         """Основной цикл Keep-Alive"""
-        while self.running:
+        while not self._stop_event.wait(self.next_delay()):
             try:
-                self._send_ping()
-                time.sleep(self.interval)
+                self.check()
             except Exception as e:
                 logger.error(f"❌ Ошибка в Keep-Alive: {e}")
-                time.sleep(self.interval)
     
     def _send_ping(self):
         """Отправить фиктивный запрос"""
@@ -66,27 +120,46 @@ class KeepAlive:
             
             if self.bot_url:
                 # Если есть URL - отправляем HTTP запрос
-                response = requests.get(self.bot_url, timeout=5)
+                response = http_client.get(self.bot_url, timeout=5)  # соединение переиспользуется между пингами
                 if response.status_code == 200:
+                    self._ping_succeeded()
                     logger.debug(f"🔄 [{self.request_count}] Keep-Alive ping успешен ({timestamp})")
                 else:
+                    self._ping_failed()
                     logger.debug(f"🔄 [{self.request_count}] Ping вернул {response.status_code} ({timestamp})")
             else:
                 # Если URL нет - просто логируем (локальный режим)
+                self._ping_succeeded()
                 logger.debug(f"🔄 [{self.request_count}] Keep-Alive активен ({timestamp})")
         
         except requests.exceptions.Timeout:
+            self._ping_failed()
             logger.warning(f"⚠️ [{self.request_count}] Keep-Alive timeout ({timestamp})")
         except Exception as e:
+            self._ping_failed()
             logger.warning(f"⚠️ [{self.request_count}] Keep-Alive ошибка: {e}")
+
+    def _ping_succeeded(self):
+        """Пинг - тоже входящий запрос: следующий нужен через полный интервал простоя"""
+        self.last_activity = self.clock()
+        self.retry_at = None
+
+    def _ping_failed(self):
+        """Неудачный пинг повторяем через interval, а не сразу"""
+        self.failed_count += 1
+        self.retry_at = self.clock() + self.interval
     
     def get_stats(self):
         """Получить статистику Keep-Alive"""
         return {
             'running': self.running,
             'requests_sent': self.request_count,
+            'pings_skipped': self.skipped_count,
+            'pings_failed': self.failed_count,
+            'idle_seconds': round(self.clock() - self.last_activity, 1),
             'interval': self.interval,
-            'bot_url': self.bot_url or 'локальный режим'
+            'bot_url': self.bot_url or 'локальный режим',
+            'http': http_client.get_stats()
         }
 
 
@@ -99,7 +172,7 @@ def init_keep_alive(render_url=None, interval=60):
     Инициализировать и запустить Keep-Alive
     
     Args:
-        render_url: URL сервиса на Render (опционально)
+        render_url: URL для пинга (опционально, по умолчанию RENDER_URL)
         interval: интервал в секундах (по умолчанию 60)
     
     Returns:
@@ -107,8 +180,8 @@ def init_keep_alive(render_url=None, interval=60):
     """
     global keep_alive
     
-    # Получаем URL из переменной окружения или используем параметр
-    url = os.getenv('RENDER_URL', render_url)
+    # Используем переданный URL или берём из переменной окружения
+    url = render_url or os.getenv('RENDER_URL')
     
     keep_alive = KeepAlive(bot_url=url, interval=interval)
     keep_alive.start()
@@ -121,3 +194,9 @@ def stop_keep_alive():
     global keep_alive
     if keep_alive:
         keep_alive.stop()
+
+
+def mark_activity():
+    """Отметить входящий запрос (вызывается из main на каждое обновление)"""
+    if keep_alive:
+        keep_alive.mark_activity()
@@ -0,0 +1,292 @@
+# keyboards.py
+# Inline-клавиатуры бота (общие для main.py и main_async.py)
+
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from telebot import types
+
+from config import USERS_DB, MEETING_TIMES, MEETING_DURATIONS, KEYBOARD_CACHE_MAX_ENTRIES
+from callback_codec import codec
+from utils import get_next_workdays, get_available_times, format_duration, get_end_time
+
+logger = logging.getLogger(__name__)
+
+
+class FrozenMarkup(types.InlineKeyboardMarkup):
+    """
+    Готовая клавиатура, общая для всех пользователей
+
+    JSON считается один раз: telebot вызывает to_json() при каждой отправке,
+    и замороженная клавиатура отдаёт сохранённую строку. Изменять её нельзя.
+    """
+
+    def __init__(self, markup):
+        super().__init__(keyboard=markup.keyboard, row_width=markup.row_width)
+        self._json = markup.to_json()
+
+    def to_json(self):
+        return self._json
+
+    def add(self, *args, **kwargs):
+        raise TypeError("Замороженную клавиатуру изменять нельзя")
+
+    row = add
+
+
+class KeyboardCache:
+    """LRU-кэш клавиатур с параметрами (ключ - имя функции и её значимые аргументы)"""
+
+    def __init__(self, max_entries=KEYBOARD_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Вернуть клавиатуру из кэша или построить через build() и запомнить"""
+        with self._lock:
+            markup = self._entries.get(key)
+            if markup is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return markup
+
+        markup = FrozenMarkup(build())
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = markup
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return markup
+
+    def get_stats(self):
+        """Статистика кэша"""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Глобальный экземпляр
+keyboard_cache = KeyboardCache()
+
+
+def static_keyboard(build):
+    """Клавиатура, зависящая только от config: строится один раз на каждый набор аргументов"""
+    @functools.lru_cache(maxsize=None)
+    @functools.wraps(build)
+    def wrapper(*args):
+        return FrozenMarkup(build(*args))
+    return wrapper
+
+
+def cached_keyboard(key):
+    """Клавиатура с параметрами: хранится в keyboard_cache под ключом key(*args)"""
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            return keyboard_cache.get((build.__name__, key(*args, **kwargs)), lambda: build(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def _today_key(*args, **kwargs):
+    """Ключ для клавиатур, меняющихся раз в сутки"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def _times_key(date_str):
+    """Для сегодняшней даты список времени зависит от текущей минуты, для остальных - от дня"""
+    now = datetime.now()
+    if date_str == now.strftime("%d.%m"):
+        return date_str, now.strftime("%Y-%m-%d %H:%M")
+    return date_str, now.strftime("%Y-%m-%d")
+
+
+@static_keyboard
+def create_users_keyboard():
+    """Создать клавиатуру со списком пользователей"""
+    markup = types.InlineKeyboardMarkup()
+    users = list(USERS_DB.keys())
+
+    for user in users:
+        button = types.InlineKeyboardButton(text=user, callback_data=codec.encode("user", user))
+        markup.add(button)
+
+    return markup
+
+
+@static_keyboard
+def create_main_menu_keyboard(is_creator):
+    """Создать главное меню"""
+    markup = types.InlineKeyboardMarkup()
+
+    if is_creator:
+        markup.add(types.InlineKeyboardButton(text="➕ Новое совещание", callback_data=codec.encode("new_meeting")))
+        markup.add(types.InlineKeyboardButton(text="📋 Созданные мной", callback_data=codec.encode("my_meetings")))
+        markup.add(types.InlineKeyboardButton(text="📅 Календарь совещаний", callback_data=codec.encode("calendar")))
+        markup.add(types.InlineKeyboardButton(text="🗑️ Удалить старые", callback_data=codec.encode("delete_old_meetings")))
+    else:
+        markup.add(types.InlineKeyboardButton(text="📋 Мои совещания", callback_data=codec.encode("guest_meetings")))
+        markup.add(types.InlineKeyboardButton(text="📅 Календарь совещаний", callback_data=codec.encode("guest_calendar")))
+
+    markup.add(types.InlineKeyboardButton(text="🚪 Выход", callback_data=codec.encode("logout")))
+    return markup
+
+
+@cached_keyboard(_today_key)
+def create_dates_keyboard():
+    """Создать клавиатуру с датами"""
+    markup = types.InlineKeyboardMarkup()
+    workdays = get_next_workdays()
+
+    for _, date_str in workdays:
+        button = types.InlineKeyboardButton(text=date_str, callback_data=codec.encode("date", date_str))
+        markup.add(button)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=codec.encode("back_to_menu")))
+    return markup
+
+
+@cached_keyboard(_times_key)
+def create_times_keyboard(date_str):
+    """Создать клавиатуру со временем"""
+    markup = types.InlineKeyboardMarkup()
+
+    # Если дата сегодня, фильтруем время
+    today = datetime.now().strftime("%d.%m")
+    if date_str == today:
+        times = get_available_times()
+    else:
+        times = MEETING_TIMES
+
+    for time_slot in times:
+        button = types.InlineKeyboardButton(text=time_slot, callback_data=codec.encode("time", time_slot))
+        markup.add(button)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=codec.encode("back_to_dates")))
+    return markup
+
+
+@static_keyboard
+def create_durations_keyboard():
+    """Создать клавиатуру с продолжительностью"""
+    markup = types.InlineKeyboardMarkup()
+
+    for duration in MEETING_DURATIONS:
+        formatted = format_duration(duration)
+        button = types.InlineKeyboardButton(text=formatted, callback_data=codec.encode("duration", duration))
+        markup.add(button)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=codec.encode("back_to_times")))
+    return markup
+
+
+@cached_keyboard(lambda creator_username, busy=(): (creator_username, frozenset(busy)))
+def create_participants_keyboard(creator_username, busy=()):
+    """
+    Создать клавиатуру с участниками
+
+    Args:
+        creator_username: создатель совещания (не показывается в списке)
+        busy: участники, занятые в выбранное время (помечаются на кнопке)
+    """
+    markup = types.InlineKeyboardMarkup()
+    participants = [user for user in USERS_DB.keys() if user != creator_username]
+
+    for participant in sorted(participants):
+        text = f"⛔ {participant} (занят)" if participant in busy else participant
+        button = types.InlineKeyboardButton(text=text, callback_data=codec.encode("participant", participant))
+        markup.add(button)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=codec.encode("back_to_durations")))
+    return markup
+
+
+@static_keyboard
+def create_confirm_participants_keyboard():
+    """Создать клавиатуру подтверждения участников"""
+    markup = types.InlineKeyboardMarkup()
+
+    markup.add(types.InlineKeyboardButton(text="✅ Состав сформирован", callback_data=codec.encode("confirm_participants")))
+    markup.add(types.InlineKeyboardButton(text="➕ Добавить еще", callback_data=codec.encode("add_more_participants")))
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=codec.encode("back_to_participants")))
+
+    return markup
+
+
+@cached_keyboard(lambda prev_page=None, next_page=None: (prev_page, next_page))
+def create_calendar_keyboard(prev_page=None, next_page=None):
+    """
+    Создать клавиатуру страницы календаря
+
+    Args:
+        prev_page, next_page: payload кнопок перехода (None - кнопки нет)
+    """
+    markup = types.InlineKeyboardMarkup()
+
+    buttons = []
+    if prev_page is not None:
+        buttons.append(types.InlineKeyboardButton(text="⬅️ Ранее", callback_data=codec.encode("calendar_page", prev_page)))
+    if next_page is not None:
+        buttons.append(types.InlineKeyboardButton(text="Далее ➡️", callback_data=codec.encode("calendar_page", next_page)))
+    if buttons:
+        markup.row(*buttons)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад в меню", callback_data=codec.encode("back_to_menu")))
+    return markup
+
+
+@static_keyboard
+def create_back_button():
+    """Создать кнопку назад в главное меню"""
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад в меню", callback_data=codec.encode("back_to_menu")))
+    return markup
+
+
+def create_delete_meetings_keyboard(past_meetings):
+    """Создать клавиатуру для удаления совещаний"""
+    markup = types.InlineKeyboardMarkup()
+
+    if not past_meetings:
+        markup.add(types.InlineKeyboardButton(text="◀️ Назад в меню", callback_data=codec.encode("back_to_menu")))
+        return markup
+
+    for meeting in past_meetings:
+        meeting_id = meeting[0]
+        date_str = meeting[2]
+        start_time = meeting[3]
+        end_time = get_end_time(start_time, meeting[4])
+
+        button_text = f"🗑️ {date_str} {start_time}-{end_time}"
+        button = types.InlineKeyboardButton(text=button_text, callback_data=codec.encode("delete_meeting", meeting_id))
+        markup.add(button)
+
+    markup.add(types.InlineKeyboardButton(text="◀️ Назад в меню", callback_data=codec.encode("back_to_menu")))
+    return markup
+
+
+@cached_keyboard(lambda meeting_id: meeting_id)
+def create_delete_confirmation_keyboard(meeting_id):
+    """Создать клавиатуру подтверждения удаления"""
+    markup = types.InlineKeyboardMarkup()
+
+    markup.add(types.InlineKeyboardButton(text="✅ Да, перенести в архив", callback_data=codec.encode("confirm_delete", meeting_id)))
+    markup.add(types.InlineKeyboardButton(text="❌ Отмена", callback_data=codec.encode("cancel_delete")))
+
+    return markup
+
+
+def prebuild_static_keyboards():
+    """Построить статические клавиатуры заранее (при запуске бота)"""
+    create_users_keyboard()
+    create_main_menu_keyboard(True)
+    create_main_menu_keyboard(False)
+    create_durations_keyboard()
+    create_confirm_participants_keyboard()
+    create_back_button()
+    logger.info("⌨️ Статические клавиатуры построены")
@@ -0,0 +1,282 @@
+# main_async.py
+# Telegram бот для управления совещаниями - версия на asyncio (AsyncTeleBot)
+#
+# Те же команды и экраны, что и в main.py (общая логика - screens.py), но один
+# event loop обслуживает всех пользователей: запросы к Telegram не блокируют
+# потоки, экраны (SQLite и состояния диалогов) выполняются в пуле async_db,
+# фоновые циклы (очистка, keep-alive, напоминания, запись состояний) - задачи
+# asyncio вместо отдельных потоков.
+# Запуск: python main_async.py (нужен aiohttp, см. requirements.txt)
+
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+
+import telebot
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+# Импорты из локальных модулей
+from database import db, MEETING_ADDED
+from async_db import adb
+from auto_cleanup import cleanup
+from state_store import conversations
+from keep_alive import KeepAlive
+from notifier import notifier
+from reminders import reminders
+from webhook import WebhookServer
+from message_editor import editor
+from outbound import outbound
+from http_client import http_client
+from keyboards import prebuild_static_keyboards
+import screens
+
+# ======================== КОНФИГУРАЦИЯ ========================
+
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+
+if not TELEGRAM_TOKEN:
+    raise ValueError("❌ ОШИБКА: Не установлена переменная окружения TELEGRAM_TOKEN!")
+
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+RENDER_URL = os.getenv('RENDER_URL')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', RENDER_URL)
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH') or f"/telegram/{hashlib.sha256(TELEGRAM_TOKEN.encode()).hexdigest()[:32]}"
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+PORT = int(os.getenv('PORT', 10000))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Инициализация бота
+bot = AsyncTeleBot(TELEGRAM_TOKEN)
+
+# Рассылка приглашений и напоминаний остаётся в своём потоке (лимиты outbound блокирующие),
+# для неё - отдельный синхронный клиент без пула потоков
+sender = telebot.TeleBot(TELEGRAM_TOKEN, threaded=False)
+http_client.install_telebot()
+outbound.install(send=http_client.request)  # лимиты Bot API для этого клиента (AsyncTeleBot ходит через aiohttp)
+
+logger.info("✅ Бот (asyncio) инициализирован успешно")
+
+
+# ======================== ОТПРАВКА ОТВЕТОВ ========================
+# Логика экранов - в screens.py (общая с main.py). Функции экранов обращаются
+# к SQLite и к состояниям диалогов, поэтому выполняются в пуле async_db
+
+async def send_reply(message, reply):
+    """Ответить на сообщение пользователя"""
+    if reply is None:
+        return
+    if reply.quote:
+        await bot.reply_to(message, reply.text, reply_markup=reply.markup)
+    else:
+        await bot.send_message(message.from_user.id, reply.text, reply_markup=reply.markup)
+    if reply.follow_up:
+        await bot.send_message(message.from_user.id, reply.follow_up[0], reply_markup=reply.follow_up[1])
+
+
+async def show_reply(call, reply):
+    """Ответить на нажатие кнопки: правка её сообщения, ответ на нажатие, следующее сообщение"""
+    if reply.text is not None:
+        await editor.edit_async(bot, reply.text, call.message.chat.id, call.message.message_id,
+                                reply_markup=reply.markup, coalesce=reply.coalesce)
+    await bot.answer_callback_query(call.id, reply.answer, show_alert=reply.alert)
+    if reply.follow_up:
+        await bot.send_message(call.from_user.id, reply.follow_up[0], reply_markup=reply.follow_up[1])
+
+
+# ======================== ОБРАБОТЧИКИ ========================
+
+@bot.message_handler(commands=['start'])
+async def cmd_start(message):
+    """Обработчик команды /start"""
+    await send_reply(message, await adb.run(screens.start, message.from_user.id))
+
+
+@bot.message_handler(commands=['help'])
+async def cmd_help(message):
+    """Обработчик команды /help"""
+    await send_reply(message, screens.help_text())
+
+
+@bot.message_handler(commands=['logout'])
+async def cmd_logout(message):
+    """Обработчик команды /logout"""
+    await send_reply(message, await adb.run(screens.logout, message.from_user.id))
+
+
+# Фильтр читает только состояния в памяти, не блокируя event loop
+@bot.message_handler(func=lambda message: screens.may_expect_password(message.from_user.id))
+async def process_password(message):
+    """Обработчик ввода пароля"""
+    await send_reply(message, await adb.run(screens.password, message.from_user.id, message.text))
+
+
+@bot.callback_query_handler(func=lambda call: True)
+async def handle_callback(call):
+    """Единая точка входа для нажатий: разбор callback_data и вызов обработчика из screens.router"""
+    route = screens.router.resolve(call.data)
+    if route is None:
+        # Кнопка из старой клавиатуры (после обновления бота) или с испорченными данными
+        await bot.answer_callback_query(call.id, screens.STALE_BUTTON)
+        return
+
+    handler, payload = route
+    await show_reply(call, await adb.run(handler, call.from_user.id, payload))
+
+
+# ======================== ФОНОВЫЕ ЗАДАЧИ ========================
+
+async def cleanup_task(wake):
+    """Спать до истечения самого раннего совещания (или добавления нового) и удалять прошедшие"""
+    while True:
+        wake.clear()
+        timeout = await adb.run(cleanup.tick)
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def keep_alive_task(keeper):
+    """Пинг сервиса, только когда Render скоро усыпит его (см. KeepAlive)"""
+    while True:
+        await asyncio.sleep(keeper.next_delay())
+        try:
+            # Пинг идёт через общий пул соединений (requests) - вне event loop
+            await asyncio.to_thread(keeper.check)
+        except Exception as e:
+            logger.error(f"❌ Ошибка в Keep-Alive: {e}")
+
+
+async def reminder_task(wake):
+    """Спать до ближайшего напоминания (или изменения совещаний) и рассылать наступившие"""
+    while True:
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=reminders.next_delay())
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+
+        for meeting_id in reminders.pop_due():
+            try:
+                reminder = await adb.run(reminders.build_reminder, meeting_id)
+                if reminder is None:
+                    continue
+                text, user_ids = reminder
+                for user_id in user_ids:
+                    # Отправляет поток рассылки (лимиты и повторы), здесь только очередь
+                    notifier.enqueue_text(user_id, text)
+                reminders.record_fired(meeting_id, len(user_ids))
+            except Exception as e:
+                logger.error(f"❌ Ошибка при отправке напоминания о совещании {meeting_id}: {e}")
+
+
+async def conversations_task():
+    """Отложенная запись состояний диалогов и удаление устаревших"""
+    elapsed = 0
+    while True:
+        await asyncio.sleep(conversations.flush_interval)
+        elapsed += conversations.flush_interval
+        try:
+            await adb.run(conversations.flush)
+            if elapsed >= 3600:
+                await adb.purge_conversation_states_before(time.time() - conversations.ttl)
+                elapsed = 0
+        except Exception as e:
+            logger.error(f"❌ Ошибка при записи состояний диалогов: {e}")
+
+
+
+# ======================== ЗАПУСК БОТА ========================
+
+async def run_webhook(loop, keeper):
+    """Запустить webhook-сервер; обновления передаются в event loop"""
+    if not WEBHOOK_URL:
+        raise ValueError("❌ ОШИБКА: Для BOT_MODE=webhook нужна переменная окружения WEBHOOK_URL или RENDER_URL!")
+
+    def on_update(update_json):
+        # Поток сервера ждёт обработки - так сохраняется ограничение очереди webhook
+        keeper.mark_activity()
+        update = types.Update.de_json(update_json)
+        asyncio.run_coroutine_threadsafe(bot.process_new_updates([update]), loop).result()
+
+    server = WebhookServer(on_update=on_update, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET, port=PORT)
+    server.start()
+
+    await bot.remove_webhook()
+    await bot.set_webhook(url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET)
+    logger.info("🌐 Webhook зарегистрирован в Telegram")
+
+    return server
+
+
+async def main():
+    """Главная функция - все фоновые циклы работают как задачи одного event loop"""
+    logger.info("🚀 Запуск бота (asyncio)...")
+    loop = asyncio.get_running_loop()
+
+    prebuild_static_keyboards()
+    notifier.start(sender)
+
+    # Напоминания: загружаем предстоящие совещания, будим задачу при их изменении
+    for meeting in await adb.get_upcoming_meetings():
+        reminders.schedule(meeting)
+    reminders_wake = asyncio.Event()
+    db.subscribe(lambda event, meeting_id: loop.call_soon_threadsafe(reminders_wake.set))
+
+    # Очистка: будим задачу, когда добавлено совещание (оно может истечь раньше остальных)
+    cleanup_wake = asyncio.Event()
+
+    def on_meeting_added(event, meeting_id):
+        if event == MEETING_ADDED:
+            loop.call_soon_threadsafe(cleanup_wake.set)
+
+    db.subscribe(on_meeting_added)
+
+    if BOT_MODE == "webhook":
+        keep_alive_url = f"{WEBHOOK_URL.rstrip('/')}/healthz" if WEBHOOK_URL else None
+    else:
+        keep_alive_url = RENDER_URL
+    keeper = KeepAlive(bot_url=keep_alive_url, interval=60)
+
+    tasks = [
+        asyncio.create_task(cleanup_task(cleanup_wake)),
+        asyncio.create_task(keep_alive_task(keeper)),
+        asyncio.create_task(reminder_task(reminders_wake)),
+        asyncio.create_task(conversations_task()),
+    ]
+    logger.info(f"✅ Бот запущен (режим: {BOT_MODE}, фоновых задач: {len(tasks)})")
+
+    webhook_server = None
+    try:
+        if BOT_MODE == "webhook":
+            webhook_server = await run_webhook(loop, keeper)
+            await asyncio.Event().wait()
+        else:
+            await bot.infinity_polling()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if webhook_server:
+            await asyncio.to_thread(webhook_server.stop)
+        notifier.stop()
+        conversations.stop()
+        await bot.close_session()
+        adb.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("🛑 Бот остановлен")
@@ -0,0 +1,207 @@
+# message_editor.py
+# Редактирование сообщений бота без лишних запросов к Telegram
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from telebot.apihelper import ApiTelegramException
+
+from config import EDIT_CACHE_MAX_ENTRIES, EDIT_COALESCE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+def _is_not_modified(error):
+    """Telegram отклонил правку, потому что текст и клавиатура не изменились"""
+    return error.error_code == 400 and "message is not modified" in (error.description or "")
+
+
+class MessageEditor:
+    """
+    Обёртка над edit_message_text
+
+    Для каждого сообщения (chat_id, message_id) помнит последние отправленные
+    текст и хэш клавиатуры: повторная правка тем же содержимым не отправляется
+    (Telegram всё равно ответил бы "message is not modified"). С coalesce=True
+    частые правки одного сообщения склеиваются: первая уходит сразу, а из
+    пришедших в течение window отправляется только последняя.
+    """
+
+    def __init__(self, max_entries=EDIT_CACHE_MAX_ENTRIES, window=EDIT_COALESCE_WINDOW, clock=time.monotonic):
+        """
+        Args:
+            max_entries: сколько сообщений помнить
+            window: интервал склейки правок (секунды)
+            clock: источник времени (для тестов)
+        """
+        self.max_entries = max_entries
+        self.window = window
+        self.clock = clock
+        self._messages = OrderedDict()  # (chat_id, message_id) -> состояние сообщения
+        self._lock = threading.Lock()
+        self.stats = {'sent': 0, 'skipped': 0, 'coalesced': 0, 'not_modified': 0}
+
+    # ======================== ОБЩАЯ ЛОГИКА ========================
+
+    @staticmethod
+    def _fingerprint(text, reply_markup):
+        """Отпечаток содержимого сообщения"""
+        return text, hash(reply_markup.to_json()) if reply_markup is not None else None
+
+    def _plan(self, key, text, reply_markup, coalesce):
+        """
+        Решить, что делать с правкой (вызывается под блокировкой)
+
+        Returns:
+            (решение, задержка): "skip", "send" или "defer" и сколько ждать для "defer"
+        """
+        fingerprint = self._fingerprint(text, reply_markup)
+        entry = self._messages.get(key)
+        if entry is None:
+            entry = {'fingerprint': None, 'sent_at': None, 'pending': None, 'timer': None}
+            self._messages[key] = entry
+            if len(self._messages) > self.max_entries:
+                _, evicted = self._messages.popitem(last=False)
+                if evicted['timer'] is not None:
+                    evicted['timer'].cancel()
+        else:
+            self._messages.move_to_end(key)
+
+        # Новая правка заменяет отложенную
+        if entry['pending'] is not None:
+            entry['pending'] = None
+            self.stats['coalesced'] += 1
+
+        if entry['fingerprint'] == fingerprint:
+            if entry['timer'] is not None:
+                entry['timer'].cancel()
+                entry['timer'] = None
+            self.stats['skipped'] += 1
+            return "skip", 0
+
+        if coalesce and entry['sent_at'] is not None:
+            elapsed = self.clock() - entry['sent_at']
+            if elapsed < self.window:
+                entry['pending'] = (text, reply_markup)
+                return "defer", self.window - elapsed
+
+        if entry['timer'] is not None:
+            entry['timer'].cancel()
+            entry['timer'] = None
+        return "send", 0
+
+    def _take_pending(self, key):
+        """Забрать отложенную правку, когда пришло её время"""
+        with self._lock:
+            entry = self._messages.get(key)
+            if entry is None:
+                return None
+            entry['timer'] = None
+            pending, entry['pending'] = entry['pending'], None
+            return pending
+
+    def _remember(self, key, text, reply_markup):
+        """Запомнить отправленное содержимое"""
+        with self._lock:
+            entry = self._messages.get(key)
+            if entry is not None:
+                entry['fingerprint'] = self._fingerprint(text, reply_markup)
+                entry['sent_at'] = self.clock()
+
+    def _forget(self, key):
+        """Забыть сообщение (после ошибки его состояние неизвестно)"""
+        with self._lock:
+            self._messages.pop(key, None)
+
+    def _handle_error(self, key, text, reply_markup, error):
+        """Ошибка правки: "не изменилось" - не ошибка, остальное пробрасываем"""
+        if isinstance(error, ApiTelegramException) and _is_not_modified(error):
+            self.stats['not_modified'] += 1
+            self._remember(key, text, reply_markup)
+            return
+        self._forget(key)
+        raise error
+
+    # ======================== СИНХРОННЫЙ БОТ ========================
+
+    def edit(self, bot, text, chat_id, message_id, reply_markup=None, coalesce=False):
+        """
+        Изменить сообщение, если его содержимое действительно меняется
+
+        Returns:
+            True если правка отправлена или отложена, False если пропущена
+        """
+        key = (chat_id, message_id)
+        with self._lock:
+            action, delay = self._plan(key, text, reply_markup, coalesce)
+            if action == "defer" and self._messages[key]['timer'] is None:
+                timer = threading.Timer(delay, self._flush, args=(bot, key))
+                timer.daemon = True
+                self._messages[key]['timer'] = timer
+                timer.start()
+
+        if action == "send":
+            self._send(bot, key, text, reply_markup)
+        return action != "skip"
+
+    def _send(self, bot, key, text, reply_markup):
+        try:
+            bot.edit_message_text(text, key[0], key[1], reply_markup=reply_markup)
+            self.stats['sent'] += 1
+            self._remember(key, text, reply_markup)
+        except Exception as e:
+            self._handle_error(key, text, reply_markup, e)
+
+    def _flush(self, bot, key):
+        """Отправить отложенную правку (поток таймера)"""
+        pending = self._take_pending(key)
+        if pending is None:
+            return
+        try:
+            self._send(bot, key, *pending)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось применить отложенную правку сообщения {key}: {e}")
+
+    # ======================== ASYNCIO (main_async.py) ========================
+
+    async def edit_async(self, bot, text, chat_id, message_id, reply_markup=None, coalesce=False):
+        """То же, что edit(), для AsyncTeleBot"""
+        key = (chat_id, message_id)
+        with self._lock:
+            action, delay = self._plan(key, text, reply_markup, coalesce)
+            if action == "defer" and self._messages[key]['timer'] is None:
+                self._messages[key]['timer'] = asyncio.create_task(self._flush_async(bot, key, delay))
+
+        if action == "send":
+            await self._send_async(bot, key, text, reply_markup)
+        return action != "skip"
+
+    async def _send_async(self, bot, key, text, reply_markup):
+        try:
+            await bot.edit_message_text(text, key[0], key[1], reply_markup=reply_markup)
+            self.stats['sent'] += 1
+            self._remember(key, text, reply_markup)
+        except Exception as e:
+            self._handle_error(key, text, reply_markup, e)
+
+    async def _flush_async(self, bot, key, delay):
+        await asyncio.sleep(delay)
+        pending = self._take_pending(key)
+        if pending is None:
+            return
+        try:
+            await self._send_async(bot, key, *pending)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось применить отложенную правку сообщения {key}: {e}")
+
+    def get_stats(self):
+        """Статистика правок"""
+        with self._lock:
+            return {'tracked': len(self._messages), **self.stats}
+
+
+# Глобальный экземпляр
+editor = MessageEditor()
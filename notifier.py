@@ -0,0 +1,229 @@
+# notifier.py
+# Фоновая рассылка приглашений на совещания участникам
+
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from config import NOTIFY_BATCH_SIZE, NOTIFY_POLL_INTERVAL, NOTIFY_MAX_RETRIES
+from database import db
+from outbound import outbound, BULK
+from utils import get_end_time
+
+logger = logging.getLogger(__name__)
+
+# Результат попытки доставки
+SENT = "sent"
+FAILED = "failed"  # доставить невозможно (бот заблокирован, чат не найден) - больше не пытаемся
+RETRY_LATER = "retry_later"  # временная ошибка (сеть, сервер Telegram) - попробуем позже
+
+
+class NotificationDispatcher:
+    """
+    Рассылка уведомлений из таблицы notifications
+
+    Рабочий поток забирает непрочитанные уведомления пачками, находит user_id
+    участника через user_sessions, отправляет сообщение и отмечает пачку
+    прочитанной одним запросом. Лимиты Telegram и повторы после 429 - забота
+    outbound (рассылка идёт с приоритетом BULK), здесь только повторы при
+    ошибках сети и сервера.
+
+    Сообщения без записи в БД (напоминания) ставятся в очередь enqueue_text
+    и отправляются тем же потоком раньше пачек приглашений. Неудачная
+    отправка не задерживает остальных получателей: сообщение возвращается
+    в очередь с нарастающей паузой.
+    """
+
+    def __init__(self, batch_size=NOTIFY_BATCH_SIZE, poll_interval=NOTIFY_POLL_INTERVAL,
+                 max_retries=NOTIFY_MAX_RETRIES):
+        """
+        Args:
+            batch_size: сколько уведомлений забирать из БД за раз
+            poll_interval: как часто проверять БД, если никто не будил (секунды)
+            max_retries: повторы отправки одного сообщения при временных ошибках
+        """
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+
+        self.bot = None
+        self._outbox = []  # куча (не раньше, порядковый номер, user_id, текст, попытка)
+        self._outbox_lock = threading.Lock()
+        self._outbox_seq = itertools.count()
+
+        self.thread = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'batches': 0, 'requeued': 0}
+
+    def start(self, bot):
+        """Запустить рассылку в отдельном потоке"""
+        if self.thread and self.thread.is_alive():
+            logger.warning("⚠️ Рассылка уведомлений уже запущена")
+            return
+
+        self.bot = bot
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.thread.start()
+        logger.info("📨 Рассылка уведомлений запущена")
+
+    def stop(self):
+        """Остановить рассылку"""
+        self._stop_event.set()
+        self._wake_event.set()
+        logger.info("🛑 Рассылка уведомлений остановлена")
+
+    def wake(self):
+        """Разбудить рассылку (появились новые уведомления или участник вошёл в бота)"""
+        self._wake_event.set()
+
+    def enqueue_text(self, user_id, text):
+        """Поставить сообщение в очередь рассылки (не ждёт отправки)"""
+        self._push(user_id, text, 0, 0)
+        self._wake_event.set()
+
+    # ======================== ВНУТРЕННЕЕ ========================
+
+    def _dispatch_loop(self):
+        """Основной цикл: разослать всё накопившееся, затем ждать пробуждения"""
+        while not self._stop_event.is_set():
+            try:
+                self._dispatch_outbox()
+                processed = self._dispatch_batch()
+            except Exception as e:
+                logger.error(f"❌ Ошибка при рассылке уведомлений: {e}")
+                processed = 0
+
+            # Полная пачка - скорее всего есть ещё, берём следующую сразу
+            if processed < self.batch_size:
+                self._wake_event.wait(self._idle_timeout())
+                self._wake_event.clear()
+
+    def _push(self, user_id, text, attempt, not_before):
+        """Добавить сообщение в очередь enqueue_text"""
+        with self._outbox_lock:
+            heapq.heappush(self._outbox, (not_before, next(self._outbox_seq), user_id, text, attempt))
+
+    def _idle_timeout(self):
+        """Сколько спать: до повтора из очереди, но не дольше poll_interval"""
+        with self._outbox_lock:
+            if not self._outbox:
+                return self.poll_interval
+            return min(self.poll_interval, max(0.0, self._outbox[0][0] - time.monotonic()))
+
+    def _dispatch_outbox(self):
+        """Отправить наступившие сообщения из очереди; неудачные вернуть в неё с паузой"""
+        now = time.monotonic()
+        with self._outbox_lock:
+            due = []
+            while self._outbox and self._outbox[0][0] <= now:
+                due.append(heapq.heappop(self._outbox))
+
+        for index, (_, _, user_id, text, attempt) in enumerate(due):
+            if self._stop_event.is_set():
+                # Не отправленное - обратно в очередь
+                for _, _, *rest in due[index:]:
+                    self._push(*rest, now)
+                return
+
+            # Одна попытка: повторяем через очередь, не задерживая остальных получателей
+            if self._deliver(user_id, text, retries=0) != RETRY_LATER:
+                continue
+            if attempt < self.max_retries:
+                self.stats['requeued'] += 1
+                self._push(user_id, text, attempt + 1, time.monotonic() + min(2 ** attempt, 60))
+            else:
+                self.stats['failed'] += 1
+                logger.warning(f"⚠️ Сообщение для {user_id} не доставлено после {attempt + 1} попыток")
+
+    def _dispatch_batch(self):
+        """Разослать одну пачку уведомлений; возвращает число обработанных"""
+        rows = db.get_pending_notifications(self.batch_size)
+        if not rows:
+            return 0
+
+        self.stats['batches'] += 1
+        done = []
+
+        for notification_id, user_id, username, *meeting in rows:
+            if self._stop_event.is_set():
+                break
+
+            status = self._deliver(user_id, self._format_invitation(*meeting))
+            if status == RETRY_LATER:
+                # Telegram недоступен - остальное из пачки отправим в следующий раз
+                break
+            done.append(notification_id)
+
+        db.mark_notifications_read(done)
+        if done:
+            logger.info(f"📨 Обработано уведомлений: {len(done)}")
+        return len(done)
+
+    def _deliver(self, user_id, text, retries=None):
+        """Отправить одно сообщение, повторяя при ошибках сети и сервера Telegram"""
+        retries = self.max_retries if retries is None else retries
+        delay = 1
+        for attempt in range(retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+
+            try:
+                # Рассылка уступает очередь ответам пользователям, работающим с ботом
+                with outbound.priority(BULK):
+                    self.bot.send_message(user_id, text)
+                self.stats['sent'] += 1
+                return SENT
+            except ApiTelegramException as e:
+                if e.error_code == 429:
+                    # outbound уже исчерпал повторы - отложим до следующего прохода
+                    logger.warning(f"⚠️ Лимит Telegram для {user_id} не снят, отправим позже")
+                    return RETRY_LATER
+                elif e.error_code < 500:
+                    self.stats['failed'] += 1
+                    logger.warning(f"⚠️ Уведомление для {user_id} не доставлено: {e.description}")
+                    return FAILED
+                else:
+                    wait = delay
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка отправки уведомления для {user_id}: {e}")
+                wait = delay
+
+            if attempt == retries or self._stop_event.wait(wait):
+                break
+            delay = min(delay * 2, 60)
+
+        return RETRY_LATER
+
+    @staticmethod
+    def _format_invitation(creator_username, date, start_time, duration_minutes, participants_json):
+        """Текст приглашения на совещание"""
+        participants = json.loads(participants_json)
+        end_time = get_end_time(start_time, duration_minutes)
+        return (
+            "📨 Вас пригласили на совещание!\n\n"
+            f"👤 Организатор: {creator_username}\n"
+            f"📅 Дата: {date}\n"
+            f"🕐 Время: {start_time} - {end_time}\n"
+            f"👥 Участники: {', '.join(participants)}"
+        )
+
+    def get_stats(self):
+        """Статистика рассылки"""
+        with self._outbox_lock:
+            queued = len(self._outbox)
+        return {
+            'running': bool(self.thread and self.thread.is_alive()),
+            'queued': queued,
+            **self.stats,
+        }
+
+
+# Глобальный экземпляр
+notifier = NotificationDispatcher()
@@ -0,0 +1,172 @@
+# outbound.py
+# Ограничение исходящих запросов к Telegram Bot API (для синхронного telebot)
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from telebot import apihelper
+
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_MAX_429_RETRIES
+from rate_limit import TokenBucket, TokenBucketRegistry
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты запросов: меньше - раньше
+URGENT = 0  # answerCallbackQuery - пользователь смотрит на "часики" на кнопке
+INTERACTIVE = 1  # ответы в обработчиках
+BULK = 2  # массовая рассылка (приглашения, напоминания)
+
+PRIORITY_NAMES = {URGENT: 'urgent', INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# Методы, которые не ограничиваем: long polling и служебные вызовы
+UNLIMITED_METHODS = {'getUpdates', 'getMe', 'setWebhook', 'deleteWebhook', 'getWebhookInfo', 'close', 'logOut'}
+
+
+class OutboundLimiter:
+    """
+    Очередь исходящих запросов с приоритетами и token bucket'ами
+
+    Подключается как apihelper.CUSTOM_REQUEST_SENDER, поэтому через неё проходят
+    все вызовы bot.* синхронного telebot. Перед отправкой запрос ждёт жетон
+    своего чата, затем встаёт в общую очередь по приоритету: глобальные
+    жетоны достаются сначала answerCallbackQuery, затем ответам обработчиков,
+    и только потом массовой рассылке. Ответ 429 обрабатывается здесь же:
+    запрос повторяется через retry_after, обработчик исключения не видит.
+    Сам запрос выполняется в потоке вызывающего, очередь лишь решает, кто
+    отправляет следующим.
+    """
+
+    def __init__(self, global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 chat_burst=TELEGRAM_CHAT_BURST, max_429_retries=TELEGRAM_MAX_429_RETRIES):
+        """
+        Args:
+            global_rate: запросов в секунду на весь бот
+            chat_rate: запросов в секунду в один чат
+            chat_burst: сколько запросов в один чат можно отправить подряд
+            max_429_retries: сколько раз повторять запрос после ответа 429
+        """
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_buckets = TokenBucketRegistry(chat_rate, chat_burst)
+        self.max_429_retries = max_429_retries
+
+        self._queue = []  # (приоритет, номер) ожидающих глобальный жетон
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._send = None
+
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0}
+        self.wait_stats = {
+            name: {'count': 0, 'wait_total': 0.0, 'wait_max': 0.0} for name in PRIORITY_NAMES.values()
+        }
+
+    def install(self, send=None):
+        """
+        Подключить ограничитель к telebot
+
+        Args:
+            send: функция, выполняющая HTTP-запрос (по умолчанию - сессия telebot)
+        """
+        self._send = send or (lambda method, url, **kwargs: apihelper._get_req_session().request(method, url, **kwargs))
+        apihelper.CUSTOM_REQUEST_SENDER = self.request
+        logger.info("🚦 Ограничение исходящих запросов к Telegram включено")
+
+    @contextmanager
+    def priority(self, level):
+        """Отправлять запросы этого потока с приоритетом level (например, BULK для рассылки)"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Выполнить запрос к Bot API (сигнатура CUSTOM_REQUEST_SENDER)"""
+        api_method = url.rsplit('/', 1)[-1]
+        if api_method in UNLIMITED_METHODS:
+            return self._send(method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+
+        if api_method == 'answerCallbackQuery':
+            level, chat_id = URGENT, None
+        else:
+            level = getattr(self._local, 'priority', None)
+            level = INTERACTIVE if level is None else level
+            chat_id = (params or {}).get('chat_id')
+
+        for attempt in range(self.max_429_retries + 1):
+            if chat_id is not None:
+                self.chat_buckets.get(chat_id).acquire()
+            self._acquire_global(level)
+
+            self.stats['requests'] += 1
+            response = self._send(method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+            if response.status_code != 429 or attempt == self.max_429_retries:
+                return response
+
+            retry_after = self._retry_after(response)
+            self.stats['rate_limited'] += 1
+            self.stats['retries'] += 1
+            logger.warning(f"⚠️ Telegram ограничил {api_method}, повтор через {retry_after} сек")
+            # Следующие запросы в этот чат (или все, если чата нет) подождут столько же
+            bucket = self.chat_buckets.get(chat_id) if chat_id is not None else self.global_bucket
+            bucket.penalize(retry_after)
+
+        return response
+
+    def _acquire_global(self, level):
+        """Дождаться своей очереди и глобального жетона"""
+        ticket = (level, next(self._counter))
+        started = time.perf_counter()
+
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                if self._queue[0] == ticket:
+                    wait = self.global_bucket.try_acquire()
+                    if wait == 0.0:
+                        heapq.heappop(self._queue)
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+        waited = time.perf_counter() - started
+        stats = self.wait_stats[PRIORITY_NAMES[level]]
+        stats['count'] += 1
+        stats['wait_total'] += waited
+        stats['wait_max'] = max(stats['wait_max'], waited)
+
+    @staticmethod
+    def _retry_after(response):
+        """Сколько секунд просит подождать Telegram в ответе 429"""
+        try:
+            return response.json().get('parameters', {}).get('retry_after', 1)
+        except ValueError:
+            return 1
+
+    def get_stats(self):
+        """Статистика: запросы, 429 и ожидание в очереди по приоритетам"""
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            'queued': queued,
+            **self.stats,
+            'wait': {
+                name: {
+                    'count': stats['count'],
+                    'avg_ms': round(stats['wait_total'] * 1000 / max(1, stats['count']), 2),
+                    'max_ms': round(stats['wait_max'] * 1000, 2),
+                }
+                for name, stats in self.wait_stats.items()
+            },
+        }
+
+
+# Глобальный экземпляр
+outbound = OutboundLimiter()
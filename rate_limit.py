@@ -0,0 +1,99 @@
+# rate_limit.py
+# Ограничение частоты запросов (token bucket) для отправки сообщений в Telegram
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Классический token bucket
+
+    Жетоны накапливаются со скоростью rate в секунду, но не больше capacity.
+    Каждая операция забирает жетон; если жетонов нет - нужно подождать.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """
+        Args:
+            rate: жетонов в секунду
+            capacity: максимальный запас жетонов (размер "всплеска"), по умолчанию rate
+            clock: источник времени (для тестов)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Начислить жетоны за прошедшее время (вызывается под блокировкой)"""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Попробовать забрать жетоны без ожидания
+
+        Returns:
+            0.0 если жетоны забраны, иначе сколько секунд ждать до их появления
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Забрать жетоны, при необходимости подождав
+
+        Returns:
+            True если жетоны получены, False если не уложились в timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Запретить операции на seconds секунд (например, после ответа 429 от Telegram)"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class TokenBucketRegistry:
+    """Отдельный token bucket на каждый ключ (например, chat_id) с ограничением числа ключей"""
+
+    def __init__(self, rate, capacity=None, max_keys=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Получить (или создать) bucket для ключа"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
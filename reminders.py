@@ -0,0 +1,204 @@
+# reminders.py
+# Напоминания о начале совещаний
+
+import heapq
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import REMINDER_MINUTES_BEFORE
+from database import db, MEETING_ADDED, MEETING_DELETED
+from utils import get_end_time
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний "совещание начнётся через N минут"
+
+    Напоминания хранятся в куче по времени срабатывания (вставка O(log n)).
+    Поток спит на Condition ровно до ближайшего напоминания и просыпается
+    раньше только при добавлении/удалении совещания (подписка на db). Удалённые
+    совещания убираются лениво: запись в куче игнорируется при срабатывании.
+    """
+
+    def __init__(self, minutes_before=REMINDER_MINUTES_BEFORE, clock=time.time):
+        """
+        Args:
+            minutes_before: за сколько минут до начала напоминать
+            clock: источник времени в секундах epoch (для тестов)
+        """
+        self.minutes_before = minutes_before
+        self.clock = clock
+
+        self.send = None
+        self._heap = []  # (время срабатывания, meeting_id)
+        self._scheduled = {}  # meeting_id -> время срабатывания (актуальные записи кучи)
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'scheduled': 0, 'cancelled': 0, 'fired': 0, 'messages': 0}
+
+        db.subscribe(self._on_meetings_changed)
+
+    def start(self, send):
+        """
+        Загрузить предстоящие совещания и запустить планировщик
+
+        Args:
+            send: функция send(user_id, text), ставящая напоминание в очередь
+                отправки (notifier.enqueue_text); не должна ждать доставки
+        """
+        if self.thread and self.thread.is_alive():
+            logger.warning("⚠️ Планировщик напоминаний уже запущен")
+            return
+
+        self.send = send
+        for meeting in db.get_upcoming_meetings():
+            self.schedule(meeting)
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._reminder_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"⏰ Планировщик напоминаний запущен (в очереди: {len(self._scheduled)})")
+
+    def stop(self):
+        """Остановить планировщик"""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        logger.info("🛑 Планировщик напоминаний остановлен")
+
+    @staticmethod
+    def _meeting_start(meeting):
+        """Время начала совещания (строка из таблицы meetings) в секундах epoch"""
+        return datetime.strptime(f"{meeting[7]} {meeting[3]}", "%Y-%m-%d %H:%M").timestamp()
+
+    def schedule(self, meeting):
+        """Запланировать напоминание для совещания (строка из таблицы meetings)"""
+        meeting_id = meeting[0]
+        start = self._meeting_start(meeting)
+        now = self.clock()
+        if start <= now:
+            return False  # уже началось
+
+        fire_at = max(now, start - self.minutes_before * 60)
+        with self._cond:
+            if self._scheduled.get(meeting_id) == fire_at:
+                return True  # уже в очереди
+            self._scheduled[meeting_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, meeting_id))
+            self.stats['scheduled'] += 1
+            # Будим поток, только если новое напоминание раньше всех остальных
+            if self._heap[0][1] == meeting_id:
+                self._cond.notify()
+        return True
+
+    def cancel(self, meeting_id):
+        """Отменить напоминание (запись в куче будет пропущена при срабатывании)"""
+        with self._cond:
+            if self._scheduled.pop(meeting_id, None) is not None:
+                self.stats['cancelled'] += 1
+
+    def _on_meetings_changed(self, event, meeting_id):
+        """Подписка на изменения совещаний в БД"""
+        if event == MEETING_ADDED:
+            meeting = db.get_meeting_by_id(meeting_id)
+            if meeting:
+                self.schedule(meeting)
+        elif event == MEETING_DELETED:
+            self.cancel(meeting_id)
+
+    def next_delay(self):
+        """Секунд до ближайшего напоминания (None, если очередь пуста)"""
+        with self._cond:
+            return max(0.0, self._heap[0][0] - self.clock()) if self._heap else None
+
+    def pop_due(self):
+        """Забрать из очереди все наступившие напоминания; возвращает их meeting_id"""
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= self.clock():
+                fire_at, meeting_id = heapq.heappop(self._heap)
+                if self._scheduled.get(meeting_id) == fire_at:
+                    del self._scheduled[meeting_id]
+                    due.append(meeting_id)
+        return due
+
+    def _reminder_loop(self):
+        """Основной цикл: спать до ближайшего напоминания и отправлять его"""
+        while not self._stop_event.is_set():
+            with self._cond:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+
+            for meeting_id in self.pop_due():
+                try:
+                    self._fire(meeting_id)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка при отправке напоминания о совещании {meeting_id}: {e}")
+
+    def build_reminder(self, meeting_id):
+        """
+        Подготовить напоминание о совещании
+
+        Returns:
+            (текст, список user_id получателей) или None, если совещания уже нет
+        """
+        meeting = db.get_meeting_by_id(meeting_id)
+        if not meeting:
+            return None
+
+        creator = meeting[1]
+        participants = json.loads(meeting[5])
+        end_time = get_end_time(meeting[3], meeting[4])
+        # Совещание могли создать меньше чем за minutes_before до начала
+        minutes_left = max(1, round((self._meeting_start(meeting) - self.clock()) / 60))
+        text = (
+            f"⏰ Через {minutes_left} мин. начнётся совещание!\n\n"
+            f"👤 Организатор: {creator}\n"
+            f"📅 {meeting[2]}, {meeting[3]} - {end_time}\n"
+            f"👥 Участники: {', '.join(participants) if participants else 'нет'}"
+        )
+        return text, db.get_user_ids_by_usernames([creator, *participants])
+
+    def record_fired(self, meeting_id, recipients):
+        """Учесть сработавшее напоминание в статистике"""
+        self.stats['fired'] += 1
+        self.stats['messages'] += recipients
+        logger.info(f"⏰ Напоминание о совещании {meeting_id} поставлено в рассылку ({recipients} чел.)")
+
+    def _fire(self, meeting_id):
+        """Поставить напоминание создателю и участникам в очередь рассылки"""
+        reminder = self.build_reminder(meeting_id)
+        if reminder is None:
+            return
+
+        text, user_ids = reminder
+        for user_id in user_ids:
+            self.send(user_id, text)
+        self.record_fired(meeting_id, len(user_ids))
+
+    def get_stats(self):
+        """Статистика планировщика"""
+        with self._cond:
+            pending = len(self._scheduled)
+            next_at = self._heap[0][0] if self._heap else None
+        return {
+            'pending': pending,
+            'next_reminder': datetime.fromtimestamp(next_at).strftime("%Y-%m-%d %H:%M:%S") if next_at else None,
+            **self.stats,
+        }
+
+
+# Глобальный экземпляр
+reminders = ReminderScheduler()
@@ -0,0 +1,477 @@
+# screens.py
+# Логика обработчиков бота, общая для main.py (telebot) и main_async.py (AsyncTeleBot)
+#
+# Функции экранов ничего не отправляют в Telegram: они читают и меняют БД и
+# состояния диалогов и возвращают Reply - что показать пользователю. main.py
+# вызывает их прямо в потоке обработчика, main_async.py - в пуле async_db,
+# чтобы SQLite не блокировал event loop.
+
+import json
+import logging
+from collections import namedtuple
+
+from config import USERS_DB, CREATORS
+from database import db
+from state_store import conversations
+from views import view_cache, encode_page_history, decode_page_history
+from notifier import notifier
+from callback_router import CallbackRouter
+from callback_codec import codec
+from keyboards import (
+    create_users_keyboard, create_main_menu_keyboard, create_dates_keyboard,
+    create_times_keyboard, create_durations_keyboard, create_participants_keyboard,
+    create_confirm_participants_keyboard, create_back_button, create_calendar_keyboard,
+    create_delete_meetings_keyboard, create_delete_confirmation_keyboard
+)
+from utils import format_duration, get_end_time
+
+logger = logging.getLogger(__name__)
+
+# Ответ на действие пользователя:
+#   text, markup - экран (для кнопки - правка её сообщения, для команды - новое сообщение)
+#   answer, alert - текст ответа на нажатие кнопки и показывать ли его окном
+#   follow_up - (текст, клавиатура) следующего сообщения, например главного меню
+#   coalesce - склеивать частые правки (см. message_editor)
+#   quote - отправить text ответом на сообщение пользователя
+Reply = namedtuple(
+    'Reply', ['text', 'markup', 'answer', 'alert', 'follow_up', 'coalesce', 'quote'],
+    defaults=(None, None, None, False, None, False, False)
+)
+
+STALE_BUTTON = "⚠️ Эта кнопка устарела. Откройте меню заново: /start"
+SESSION_EXPIRED = Reply(answer="❌ Сессия истекла", alert=True)
+DRAFT_EXPIRED = Reply(answer="❌ Черновик совещания устарел, создайте совещание заново", alert=True)
+
+# Хранилище временных данных пользователя (LRU + отложенная запись в SQLite)
+user_data = conversations
+
+# Обработчики нажатий inline-кнопок: handler(user_id, payload) -> Reply
+router = CallbackRouter(codec=codec)
+
+
+def main_menu(username):
+    """Главное меню отдельным сообщением"""
+    return "Выберите действие:", create_main_menu_keyboard(username in CREATORS)
+
+
+def get_meeting_draft(user_id, required=()):
+    """
+    Получить черновик совещания пользователя
+
+    Returns:
+        черновик или None, если его нет (истёк или бот перезапускался без него)
+        или в нём нет полей required
+    """
+    meeting = user_data.get(user_id, {}).get("meeting")
+
+    if not meeting or any(key not in meeting for key in required):
+        return None
+
+    return meeting
+
+
+# ======================== КОМАНДЫ ========================
+
+def start(user_id):
+    """Команда /start"""
+    # Проверяем, не в сессии ли пользователь
+    if db.get_user_session(user_id):
+        return Reply("❌ Вы уже в сессии! Используйте /logout для выхода.", quote=True)
+
+    # Сохраняем состояние
+    user_data[user_id] = {"state": "choosing_user"}
+    return Reply("👋 Добро пожаловать! Выберите своё имя и фамилию:", create_users_keyboard())
+
+
+def help_text():
+    """Команда /help"""
+    return Reply(
+        "📖 Справка по командам:\n\n"
+        "/start - Начало работы\n"
+        "/logout - Выход из аккаунта\n"
+        "/help - Показать эту справку\n\n"
+        "Используйте кнопки меню для навигации."
+    )
+
+
+def logout(user_id):
+    """Команда /logout и кнопка выхода"""
+    db.remove_user_session(user_id)
+    user_data.pop(user_id, None)
+    return Reply("👋 Вы вышли из аккаунта.")
+
+
+def may_expect_password(user_id):
+    """
+    Фильтр сообщений для password() без обращения к БД
+
+    Если состояния пользователя нет в памяти, сообщение пропускается в
+    password(), который загрузит состояние и проверит его сам.
+    """
+    known, record = user_data.peek(user_id)
+    return not known or (record or {}).get("state") == "entering_password"
+
+
+def password(user_id, text):
+    """Ввод пароля; None - пользователь пароль не вводит, отвечать не нужно"""
+    record = user_data.get(user_id)
+    if not record or record.get("state") != "entering_password":
+        return None
+
+    username = record["username"]
+
+    # Проверяем пароль
+    if USERS_DB.get(username) != text:
+        return Reply("❌ Неверный пароль! Попробуйте еще раз:")
+
+    # Добавляем пользователя в сессию
+    if not db.add_user_session(user_id, username):
+        return Reply("❌ Ошибка: вы уже в сессии в другом месте!")
+
+    # Доставляем приглашения, пришедшие, пока пользователь не был в сессии
+    notifier.wake()
+
+    record["state"] = "main_menu"
+
+    # Показываем главное меню
+    markup = create_main_menu_keyboard(username in CREATORS)
+    return Reply(
+        "✅ Идентификация успешна!",
+        follow_up=(f"👋 Добро пожаловать, {username}!\n\nВыберите действие:", markup)
+    )
+
+
+# ======================== КНОПКИ ========================
+
+@router.route("user")
+def user_choice(user_id, username):
+    """Выбор пользователя"""
+    user_data[user_id] = {"username": username, "state": "entering_password"}
+    return Reply(f"Вы выбрали: {username}\n\nВведите пароль:")
+
+
+@router.route("new_meeting", payload=None)
+def new_meeting(user_id, payload=None):
+    """Создание нового совещания"""
+    username = db.get_user_session(user_id)
+
+    if not username:
+        return SESSION_EXPIRED
+
+    if username not in CREATORS:
+        return Reply(answer="❌ У вас нет прав создавать совещания", alert=True)
+
+    # Инициализируем данные совещания
+    if user_id not in user_data:
+        user_data[user_id] = {}
+
+    user_data[user_id]["meeting"] = {
+        "creator": username,
+        "participants": []
+    }
+
+    return Reply("📅 Выберите дату:", create_dates_keyboard())
+
+
+@router.route("date")
+def meeting_date(user_id, date_str):
+    """Выбор даты совещания"""
+    meeting = get_meeting_draft(user_id, required=("creator",))
+    if meeting is None:
+        return DRAFT_EXPIRED
+
+    meeting["date"] = date_str
+    return Reply(f"🕐 Выберите время (дата: {date_str}):", create_times_keyboard(date_str))
+
+
+@router.route("time")
+def meeting_time(user_id, time_str):
+    """Выбор времени совещания"""
+    meeting = get_meeting_draft(user_id, required=("date",))
+    if meeting is None:
+        return DRAFT_EXPIRED
+
+    meeting["time"] = time_str
+    return Reply(f"⏱️ Выберите продолжительность (время: {time_str}):", create_durations_keyboard())
+
+
+@router.route("duration", payload=int)
+def meeting_duration(user_id, duration):
+    """Выбор продолжительности совещания"""
+    meeting = get_meeting_draft(user_id, required=("date", "time"))
+    if meeting is None:
+        return DRAFT_EXPIRED
+
+    meeting["duration"] = duration
+
+    username = db.get_user_session(user_id)
+
+    # Занятость всех кандидатов считаем одним запросом, чтобы показать её сразу на кнопках
+    candidates = [user for user in USERS_DB.keys() if user != username]
+    availability = db.check_users_availability(candidates, meeting["date"], meeting["time"], duration)
+    meeting["busy"] = [user for user, is_free in availability.items() if not is_free]
+
+    return Reply(
+        f"👥 Выберите участников (продолжительность: {format_duration(duration)}):",
+        create_participants_keyboard(username, meeting["busy"])
+    )
+
+
+@router.route("participant")
+def add_participant(user_id, participant):
+    """Добавление (или удаление) участника"""
+    meeting = get_meeting_draft(user_id, required=("date", "time", "duration", "participants"))
+    if meeting is None:
+        return DRAFT_EXPIRED
+
+    # Проверяем, свободен ли участник (занятость уже посчитана при выборе продолжительности)
+    if "busy" in meeting:
+        is_free = participant not in meeting["busy"]
+    else:
+        is_free = db.check_user_availability(participant, meeting["date"], meeting["time"], meeting["duration"])
+
+    if not is_free:
+        return Reply(answer=f"❌ {participant} занят в это время!", alert=True)
+
+    # Добавляем или удаляем участника
+    if participant not in meeting["participants"]:
+        meeting["participants"].append(participant)
+        answer = f"✅ {participant} добавлен"
+    else:
+        meeting["participants"].remove(participant)
+        answer = f"❌ {participant} удален"
+
+    # Показываем список добавленных участников
+    participants_list = "\n".join([f"• {p}" for p in meeting["participants"]]) if meeting["participants"] else "нет"
+
+    return Reply(
+        f"Добавленные участники:\n{participants_list}\n\nДобавить еще?",
+        create_confirm_participants_keyboard(),
+        answer=answer,
+        coalesce=True  # быстрые нажатия по участникам - одна правка вместо нескольких
+    )
+
+
+@router.route("confirm_participants", payload=None)
+def confirm_participants(user_id, payload=None):
+    """Подтверждение состава участников: сохранение совещания"""
+    username = db.get_user_session(user_id)
+
+    meeting = get_meeting_draft(user_id, required=("creator", "date", "time", "duration", "participants"))
+    if meeting is None:
+        return DRAFT_EXPIRED
+
+    # Сохраняем совещание и уведомления участникам одной транзакцией
+    meeting_id, busy = db.create_meeting_with_notifications(
+        creator_username=meeting["creator"],
+        date=meeting["date"],
+        start_time=meeting["time"],
+        duration_minutes=meeting["duration"],
+        participants=meeting["participants"]
+    )
+
+    if busy:
+        # Пока выбирали участников, кто-то занял их в это же время
+        meeting["busy"] = sorted(set(meeting.get("busy", [])) | set(busy))
+        meeting["participants"] = [p for p in meeting["participants"] if p not in busy]
+        return Reply(
+            "👥 Выберите участников:",
+            create_participants_keyboard(username, meeting["busy"]),
+            answer=f"❌ Уже заняты в это время: {', '.join(busy)}",
+            alert=True
+        )
+
+    if meeting_id is None:
+        return Reply(answer="❌ Не удалось создать совещание, попробуйте еще раз", alert=True)
+
+    # Рассылка идёт в фоне, обработчик не ждёт отправки сообщений участникам
+    notifier.wake()
+
+    end_time = get_end_time(meeting["time"], meeting["duration"])
+
+    return Reply(
+        "✅ Совещание успешно создано!\n\n"
+        f"Дата: {meeting['date']}\n"
+        f"Время: {meeting['time']} - {end_time}\n"
+        f"Участники: {', '.join(meeting['participants']) if meeting['participants'] else 'без участников'}\n\n"
+        "Участникам отправлены уведомления.",
+        follow_up=main_menu(username)
+    )
+
+
+@router.route("add_more_participants", "back_to_participants", payload=None)
+def choose_participants(user_id, payload=None):
+    """Кнопки "добавить ещё" и "назад" к выбору участников"""
+    username = db.get_user_session(user_id)
+    busy = user_data.get(user_id, {}).get("meeting", {}).get("busy", [])
+    return Reply("👥 Выберите участников:", create_participants_keyboard(username, busy))
+
+
+@router.route("my_meetings", payload=None)
+def my_meetings(user_id, payload=None):
+    """Просмотр своих совещаний"""
+    username = db.get_user_session(user_id)
+
+    if not username:
+        return SESSION_EXPIRED
+
+    return Reply(view_cache.get("my_meetings", username), create_back_button())
+
+
+@router.route("guest_meetings", payload=None)
+def guest_meetings(user_id, payload=None):
+    """Просмотр совещаний для приглашенных"""
+    username = db.get_user_session(user_id)
+
+    if not username:
+        return SESSION_EXPIRED
+
+    return Reply(view_cache.get("guest_meetings", username), create_back_button())
+
+
+@router.route("calendar", "guest_calendar", payload=None)
+def calendar(user_id, payload=None):
+    """Календарь совещаний (для создателей и приглашённых) - первая страница"""
+    return calendar_page(user_id, [0])
+
+
+@router.route("calendar_page", payload=decode_page_history)
+def calendar_page(user_id, pages):
+    """
+    Страница календаря
+
+    Args:
+        pages: начала всех просмотренных страниц, последняя - текущая
+            (хранятся в кнопках, чтобы "Ранее" вело ровно на предыдущую страницу)
+    """
+    response, next_start = view_cache.get("calendar", pages[-1])
+
+    markup = create_calendar_keyboard(
+        prev_page=encode_page_history(pages[:-1]) if len(pages) > 1 else None,
+        next_page=encode_page_history(pages + [next_start]) if next_start is not None else None
+    )
+    return Reply(response, markup)
+
+
+@router.route("delete_old_meetings", payload=None)
+def delete_old_meetings(user_id, payload=None):
+    """Список прошедших совещаний для удаления"""
+    username = db.get_user_session(user_id)
+
+    if not username:
+        return SESSION_EXPIRED
+
+    # Получаем прошедшие совещания
+    past_meetings = db.get_past_meetings(username)
+
+    if not past_meetings:
+        return Reply(
+            "✅ У вас нет прошедших совещаний для удаления.\n\n"
+            "Все ваши совещания еще впереди!",
+            create_back_button()
+        )
+
+    # Формируем ответ
+    response = f"🗑️ Прошедшие совещания ({len(past_meetings)} шт):\n\n"
+    response += "Выберите совещание для удаления:\n"
+
+    return Reply(response, create_delete_meetings_keyboard(past_meetings))
+
+
+@router.route("delete_meeting", payload=int)
+def select_delete_meeting(user_id, meeting_id):
+    """Выбор совещания для удаления"""
+    # Получаем информацию о совещании
+    meeting = db.get_meeting_by_id(meeting_id)
+
+    if not meeting:
+        return Reply(answer="❌ Совещание не найдено", alert=True)
+
+    date_str = meeting[2]
+    start_time = meeting[3]
+    duration = meeting[4]
+    end_time = get_end_time(start_time, duration)
+    participants = json.loads(meeting[5])
+
+    response = (
+        f"❓ Удалить это совещание из списка?\n\n"
+        f"📅 Дата: {date_str}\n"
+        f"🕐 Время: {start_time} - {end_time}\n"
+        f"👥 Участники: {', '.join(participants) if participants else 'нет'}\n\n"
+        f"🗄️ Совещание будет перенесено в архив и останется в истории."
+    )
+
+    return Reply(response, create_delete_confirmation_keyboard(meeting_id))
+
+
+@router.route("confirm_delete", payload=int)
+def confirm_delete(user_id, meeting_id):
+    """Подтверждение удаления"""
+    username = db.get_user_session(user_id)
+
+    # Получаем информацию о совещании
+    meeting = db.get_meeting_by_id(meeting_id)
+
+    if not meeting:
+        return Reply(answer="❌ Совещание не найдено", alert=True)
+
+    # Проверяем, что это совещание пользователя
+    if meeting[1] != username:
+        return Reply(answer="❌ Это не ваше совещание", alert=True)
+
+    # Удаляем совещание из БД (оно переносится в архив)
+    db.delete_meeting(meeting_id)
+
+    date_str = meeting[2]
+    start_time = meeting[3]
+    end_time = get_end_time(start_time, meeting[4])
+
+    return Reply(
+        f"✅ Совещание удалено!\n\n"
+        f"📅 {date_str}, {start_time} - {end_time}\n\n"
+        f"Совещание перенесено в архив.",
+        follow_up=main_menu(username)
+    )
+
+
+@router.route("cancel_delete", payload=None)
+def cancel_delete(user_id, payload=None):
+    """Отмена удаления"""
+    username = db.get_user_session(user_id)
+    return Reply("❌ Удаление отменено.", follow_up=main_menu(username))
+
+
+@router.route("logout", payload=None)
+def logout_button(user_id, payload=None):
+    """Кнопка выхода"""
+    return logout(user_id)
+
+
+# ======================== КНОПКИ "НАЗАД" ========================
+
+@router.route("back_to_menu", payload=None)
+def back_to_menu(user_id, payload=None):
+    username = db.get_user_session(user_id)
+    return Reply(*main_menu(username))
+
+
+@router.route("back_to_dates", payload=None)
+def back_to_dates(user_id, payload=None):
+    return Reply("📅 Выберите дату:", create_dates_keyboard())
+
+
+@router.route("back_to_times", payload=None)
+def back_to_times(user_id, payload=None):
+    meeting = get_meeting_draft(user_id, required=("date",))
+    if meeting is None:
+        return DRAFT_EXPIRED
+    date_str = meeting["date"]
+    return Reply(f"🕐 Выберите время (дата: {date_str}):", create_times_keyboard(date_str))
+
+
+@router.route("back_to_durations", payload=None)
+def back_to_durations(user_id, payload=None):
+    meeting = get_meeting_draft(user_id, required=("time",))
+    if meeting is None:
+        return DRAFT_EXPIRED
+    return Reply(f"⏱️ Выберите продолжительность (время: {meeting['time']}):", create_durations_keyboard())
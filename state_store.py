@@ -0,0 +1,303 @@
+# state_store.py
+# Хранилище состояний диалогов пользователей (вместо глобального словаря user_data)
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from config import CONVERSATION_MAX_USERS, CONVERSATION_TTL, CONVERSATION_FLUSH_INTERVAL
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(record):
+    """Компактная сериализация записи пользователя"""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+class ConversationStore:
+    """
+    Состояния диалогов: LRU в памяти + отложенная запись в SQLite
+
+    Интерфейс как у словаря (store[user_id], store.get, store.pop, in), поэтому
+    обработчики работают с ним так же, как со старым user_data. Обработчики
+    меняют вложенные словари напрямую, поэтому выданная запись проверяется при
+    следующей записи в БД: она записывается, только если её JSON отличается от
+    уже сохранённого. Чтение из БД выполняется без общей блокировки.
+    """
+
+    def __init__(self, max_users=CONVERSATION_MAX_USERS, ttl=CONVERSATION_TTL,
+                 flush_interval=CONVERSATION_FLUSH_INTERVAL, persist=True):
+        """
+        Args:
+            max_users: сколько пользователей держать в памяти (остальные - только в БД)
+            ttl: через сколько секунд без активности состояние забывается
+            flush_interval: период записи изменений в БД в секундах
+            persist: сохранять ли состояния в SQLite
+        """
+        self.max_users = max_users
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.persist = persist
+
+        # user_id -> (запись, время последнего обращения, JSON в БД или None, если не сохранена)
+        self._records = OrderedDict()
+        self._dirty = set()  # выданные или изменённые записи - проверить при записи в БД
+        self._deleted = set()
+        self._missing = OrderedDict()  # пользователи, у которых в БД нет состояния
+        self._evicted = {}  # вытесненные из памяти, но ещё не записанные: user_id -> (json, время)
+        self._writing = {}  # записываются в БД прямо сейчас: user_id -> (json, время)
+        self._lock = threading.RLock()
+
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'hits': 0, 'loads': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'flushed': 0}
+
+    # ======================== ИНТЕРФЕЙС СЛОВАРЯ ========================
+
+    def get(self, user_id, default=None):
+        """Получить состояние пользователя (или default); при необходимости читает БД"""
+        known, record = self.peek(user_id)
+        if not known:
+            # БД читаем без блокировки, чтобы не задерживать обработчики других пользователей
+            row = db.load_conversation_state(user_id)
+            with self._lock:
+                known, record = self._peek(user_id)  # пока читали, запись могли создать или удалить
+                if not known:
+                    record = self._install(user_id, row)
+        return default if record is None else record
+
+    def peek(self, user_id):
+        """
+        Найти состояние без обращения к БД
+
+        Returns:
+            (известно ли состояние, запись или None); (False, None) - нужно читать БД через get()
+        """
+        with self._lock:
+            return self._peek(user_id)
+
+    def __getitem__(self, user_id):
+        record = self.get(user_id)
+        if record is None:
+            raise KeyError(user_id)
+        return record
+
+    def __setitem__(self, user_id, record):
+        with self._lock:
+            self._deleted.discard(user_id)
+            self._missing.pop(user_id, None)
+            self._evicted.pop(user_id, None)
+            self._records[user_id] = (record, time.time(), None)
+            self._records.move_to_end(user_id)
+            self._dirty.add(user_id)
+            self._evict()
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def pop(self, user_id, default=None):
+        """Удалить состояние пользователя"""
+        with self._lock:
+            entry = self._records.pop(user_id, None)
+            record = entry[0] if entry is not None else None
+            self._evicted.pop(user_id, None)
+            self._dirty.discard(user_id)
+            self._missing.pop(user_id, None)
+            self._deleted.add(user_id)
+            return default if record is None else record
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    # ======================== ВНУТРЕННЕЕ ========================
+
+    def _peek(self, user_id):
+        """Найти запись в памяти или в очередях записи (вызывается под блокировкой)"""
+        now = time.time()
+        entry = self._records.get(user_id)
+
+        if entry is not None:
+            record, accessed, saved = entry
+            if now - accessed > self.ttl:
+                # Состояние устарело - забываем его
+                self._records.pop(user_id)
+                self._dirty.discard(user_id)
+                self._deleted.add(user_id)
+                self.stats['expired'] += 1
+                return True, None
+            self.stats['hits'] += 1
+            self._touch(user_id, record, now, saved)
+            return True, record
+
+        if user_id in self._deleted or user_id in self._missing:
+            if user_id in self._missing:
+                self._missing.move_to_end(user_id)
+            self.stats['misses'] += 1
+            return True, None
+
+        pending = self._evicted.pop(user_id, None) or self._writing.get(user_id)
+        if pending is not None:
+            # Ещё не записана в БД - возвращаем в память как несохранённую
+            return True, self._install(user_id, pending, saved=False)
+
+        if not self.persist:
+            self.stats['misses'] += 1
+            return True, None
+        return False, None
+
+    def _install(self, user_id, row, saved=True):
+        """Поместить загруженную запись (json, время изменения) в память (вызывается под блокировкой)"""
+        if row is None:
+            self._mark_missing(user_id)
+            self.stats['misses'] += 1
+            return None
+
+        state_json, updated_at = row
+        now = time.time()
+        if now - updated_at > self.ttl:
+            self._deleted.add(user_id)
+            self.stats['expired'] += 1
+            return None
+
+        record = json.loads(state_json)
+        self.stats['loads'] += 1
+        self._touch(user_id, record, now, state_json if saved else None)
+        self._evict()
+        return record
+
+    def _mark_missing(self, user_id):
+        """Запомнить, что в БД нет состояния пользователя (LRU на max_users записей)"""
+        self._missing[user_id] = True
+        self._missing.move_to_end(user_id)
+        while len(self._missing) > self.max_users:
+            self._missing.popitem(last=False)
+
+    def _touch(self, user_id, record, now, saved):
+        """Отметить обращение: запись выдаётся обработчику и может быть изменена"""
+        self._records[user_id] = (record, now, saved)
+        self._records.move_to_end(user_id)
+        self._dirty.add(user_id)
+
+    def _evict(self):
+        """Вытеснить самых давних пользователей сверх лимита (вызывается под блокировкой)"""
+        while len(self._records) > self.max_users:
+            user_id, (record, accessed, saved) = self._records.popitem(last=False)
+            if user_id in self._dirty:
+                self._dirty.discard(user_id)
+                state_json = _encode(record)
+                if self.persist and state_json != saved:
+                    self._evicted[user_id] = (state_json, accessed)
+            self.stats['evictions'] += 1
+
+    # ======================== ЗАПИСЬ В БД ========================
+
+    def flush(self):
+        """Записать изменённые состояния в БД"""
+        if not self.persist:
+            return 0
+
+        with self._lock:
+            items = []
+            for user_id in self._dirty:
+                entry = self._records.get(user_id)
+                if entry is None:
+                    continue
+                record, accessed, saved = entry
+                state_json = _encode(record)
+                if state_json != saved:
+                    items.append((user_id, state_json, accessed))
+                    self._records[user_id] = (record, accessed, state_json)
+            items.extend((user_id, state_json, updated_at)
+                         for user_id, (state_json, updated_at) in self._evicted.items())
+            deleted = list(self._deleted)
+
+            # Недавно выданные записи обработчик может ещё менять - проверим их и в следующий раз
+            recent = time.time() - self.flush_interval
+            self._dirty = {user_id for user_id in self._dirty
+                           if user_id in self._records and self._records[user_id][1] > recent}
+            self._writing = dict(self._evicted)
+            self._evicted.clear()
+            self._deleted.clear()
+            for user_id in deleted:
+                if user_id not in self._records:
+                    self._mark_missing(user_id)
+
+        saved = not items or db.save_conversation_states(items)
+        with self._lock:
+            self._writing = {}
+            if not saved:
+                # Не удалось записать - вернём в очередь, попробуем в следующий раз
+                for user_id, state_json, updated_at in items:
+                    entry = self._records.get(user_id)
+                    if entry is not None:
+                        self._records[user_id] = (entry[0], entry[1], None)
+                        self._dirty.add(user_id)
+                    elif user_id not in self._deleted:
+                        self._evicted.setdefault(user_id, (state_json, updated_at))
+                for user_id in deleted:
+                    if user_id not in self._records:
+                        self._missing.pop(user_id, None)
+                        self._deleted.add(user_id)
+        if not saved:
+            return 0
+
+        if deleted:
+            db.delete_conversation_states(deleted)
+
+        self.stats['flushed'] += len(items)
+        return len(items)
+
+    def start(self):
+        """Запустить фоновую запись состояний в БД"""
+        if not self.persist:
+            return
+        if self.thread and self.thread.is_alive():
+            logger.warning("⚠️ Запись состояний диалогов уже запущена")
+            return
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"💾 Запись состояний диалогов запущена (интервал: {self.flush_interval} сек)")
+
+    def stop(self):
+        """Остановить фоновую запись и сохранить всё несохранённое"""
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        logger.info("🛑 Запись состояний диалогов остановлена")
+
+    def _flush_loop(self):
+        """Основной цикл отложенной записи"""
+        last_purge = time.time()
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+
+                # Устаревшие состояния удаляем из БД не чаще раза в час
+                if time.time() - last_purge > 3600:
+                    db.purge_conversation_states_before(time.time() - self.ttl)
+                    last_purge = time.time()
+            except Exception as e:
+                logger.error(f"❌ Ошибка при записи состояний диалогов: {e}")
+
+    def get_stats(self):
+        """Статистика хранилища"""
+        with self._lock:
+            return {
+                'in_memory': len(self._records),
+                'max_users': self.max_users,
+                'pending_writes': len(self._evicted) + len(self._deleted),
+                'known_missing': len(self._missing),
+                **self.stats,
+            }
+
+
+# Глобальный экземпляр
+conversations = ConversationStore()
@@ -0,0 +1,31 @@
+# conftest.py
+# Общие фикстуры тестов: модули бота лежат в корне репозитория
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Глобальный db создаётся при импорте database - не трогаем /tmp/bot_database.db
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'bot_database.db'))
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Путь к отдельной БД теста (Database() читает его из DB_PATH)"""
+    path = str(tmp_path / 'bot_database.db')
+    monkeypatch.setenv('DB_PATH', path)
+    return path
+
+
+@pytest.fixture
+def database(db_path):
+    """Свежая БД с текущей схемой"""
+    from database import Database
+
+    instance = Database()
+    yield instance
+    instance.close()
@@ -0,0 +1,101 @@
+# test_database.py
+# Миграции схемы и выборки database.Database
+
+import sqlite3
+
+from database import Database
+
+
+def create_baseline_db(path, meetings):
+    """БД в исходной схеме: дата совещания - ДД.ММ без года"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE meetings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            creator_username TEXT NOT NULL,
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            duration_minutes INTEGER NOT NULL,
+            participants TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.executemany(
+        '''INSERT INTO meetings (id, creator_username, date, start_time, duration_minutes,
+                                 participants, created_at)
+           VALUES (?, 'Рыжов Д.А.', ?, '10:00', 60, '["Морозов Д.А."]', ?)''',
+        meetings
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_migration_dates_legacy_meetings_from_created_at(db_path):
+    """Прошедшее совещание остаётся в году создания, а не уезжает в следующий"""
+    create_baseline_db(db_path, [
+        (1, '15.09', '2025-09-10 08:00:00'),  # месяц создания
+        (2, '10.01', '2025-12-20 08:00:00'),  # месяц раньше месяца создания - следующий год
+        (3, '20.03', None),                   # created_at нет - год от текущего дня
+    ])
+
+    database = Database()
+    try:
+        with database._connection() as conn:
+            meeting_dates = dict(conn.execute('SELECT id, meeting_date FROM meetings'))
+            busy_dates = dict(conn.execute('SELECT meeting_id, meeting_date FROM meeting_participants'))
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        database.close()
+
+    assert meeting_dates[1] == '2025-09-15'
+    assert meeting_dates[2] == '2026-01-10'
+    assert meeting_dates[3] == Database._legacy_meeting_date('20.03', None)
+    assert busy_dates == meeting_dates
+    assert version >= 3
+
+
+def test_migrated_past_meeting_is_archived(db_path):
+    """Старое совещание после миграции считается прошедшим и уходит в архив"""
+    create_baseline_db(db_path, [(1, '15.09', '2025-09-10 08:00:00')])
+
+    database = Database()
+    try:
+        counts = database.purge_meetings_before('2026-01-01')
+        history = database.get_meeting_history(participant_username='Морозов Д.А.')
+    finally:
+        database.close()
+
+    assert counts['meetings'] == 1
+    assert [row[0] for row in history] == [1]
+
+
+def test_pending_notification_has_one_delivery_target(database):
+    """Имя, вошедшее с двух аккаунтов, получает приглашение один раз - в последнюю сессию"""
+    database.add_user_session(101, 'Морозов Д.А.')
+    database.add_user_session(102, 'Морозов Д.А.')
+    with database._connection() as conn:
+        conn.execute("UPDATE user_sessions SET login_time = '2026-01-01 09:00:00' WHERE user_id = 101")
+        conn.execute("UPDATE user_sessions SET login_time = '2026-01-02 09:00:00' WHERE user_id = 102")
+        conn.commit()
+
+    meeting_id, busy = database.create_meeting_with_notifications(
+        'Рыжов Д.А.', '15.09', '10:00', 60, ['Морозов Д.А.']
+    )
+    assert meeting_id is not None and not busy
+
+    pending = database.get_pending_notifications()
+    assert [(user_id, username) for _, user_id, username, *_ in pending] == [(102, 'Морозов Д.А.')]
+
+
+def test_deleted_meeting_without_date_keeps_participant_history(db_path):
+    """Участники совещания без календарной даты (некорректная ДД.ММ) попадают в архив"""
+    create_baseline_db(db_path, [(1, '31.02', '2025-09-10 08:00:00')])
+
+    database = Database()
+    try:
+        assert database.delete_meeting(1)
+        history = database.get_meeting_history(participant_username='Морозов Д.А.')
+    finally:
+        database.close()
+
+    assert [row[0] for row in history] == [1]
@@ -31,6 +31,19 @@ def get_next_workdays(start_date=None, count=WORKDAYS_COUNT):
     return workdays
 
 
+def get_workdays_range(workdays):
+    """
+    Получить границы списка рабочих дней для запросов к БД
+
+    Args:
+        workdays: результат get_next_workdays()
+
+    Returns:
+        кортеж (первая_дата, последняя_дата) в формате ГГГГ-ММ-ДД
+    """
+    return workdays[0][0].strftime("%Y-%m-%d"), workdays[-1][0].strftime("%Y-%m-%d")
+
+
 def get_available_times(current_hour=None):
     """
     Получить доступное время для совещаний
@@ -92,18 +105,19 @@ def get_end_time(start_time, duration_minutes):
     return minutes_to_time(end_minutes)
 
 
-def parse_date_string(date_str):
+def parse_date_string(date_str, now=None):
     """
     Преобразовать строку ДД.ММ в объект datetime
     
     Args:
         date_str: строка вида "ДД.ММ"
+        now: от какого момента отсчитывать год (по умолчанию - текущий)
     
     Returns:
         объект datetime
     """
     day, month = map(int, date_str.split('.'))
-    now = datetime.now()
+    now = now or datetime.now()
     
     # Определяем год (если месяц меньше текущего, это следующий год)
     year = now.year if month >= now.month else now.year + 1
@@ -111,6 +125,15 @@ def parse_date_string(date_str):
     return datetime(year, month, day)
 
 
+def date_to_iso(date_str, now=None):
+    """
+    Преобразовать строку ДД.ММ в календарную дату ГГГГ-ММ-ДД
+
+    Год определяется так же, как в parse_date_string
+    """
+    return parse_date_string(date_str, now).strftime("%Y-%m-%d")
+
+
 def escape_html(text):
     """Экранировать HTML символы"""
     text = str(text)
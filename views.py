@@ -0,0 +1,274 @@
+# views.py
+# Формирование текстов экранов со списками совещаний и кэш готовых экранов
+
+import json
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+
+from config import VIEW_CACHE_MAX_ENTRIES, CALENDAR_PAGE_CHARS
+from database import db
+from utils import get_next_workdays, get_end_time, get_workdays_range
+
+logger = logging.getLogger(__name__)
+
+# Номер первого рабочего дня страницы календаря - одним символом в callback_data
+PAGE_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+# ======================== ФОРМИРОВАНИЕ ЭКРАНОВ ========================
+
+def render_my_meetings(username):
+    """Текст экрана "Созданные мной" для создателя"""
+    workdays = get_next_workdays()
+    meetings = db.get_meetings_between(*get_workdays_range(workdays), creator_username=username)
+    workday_dates = {date_str: None for _, date_str in workdays}
+
+    # Группируем совещания по датам
+    for meeting in meetings:
+        date_str = meeting[2]
+        if date_str in workday_dates:
+            if workday_dates[date_str] is None:
+                workday_dates[date_str] = []
+            workday_dates[date_str].append(meeting)
+
+    # Формируем ответ
+    response = "📋 Созданные вами совещания:\n\n"
+
+    for date_str in workday_dates:
+        if workday_dates[date_str] is None:
+            response += f"📅 {date_str} - у Вас нет совещаний\n\n"
+        elif len(workday_dates[date_str]) == 1:
+            meeting = workday_dates[date_str][0]
+            end_time = get_end_time(meeting[3], meeting[4])
+            participants = json.loads(meeting[5])
+            response += (
+                f"📅 {date_str} - у Вас совещание с {meeting[3]} по {end_time}, "
+                f"участники: {', '.join(participants)}\n\n"
+            )
+        else:
+            response += f"📅 {date_str} - у Вас {len(workday_dates[date_str])} совещаний в этот день:\n"
+            for meeting in workday_dates[date_str]:
+                end_time = get_end_time(meeting[3], meeting[4])
+                participants = json.loads(meeting[5])
+                response += f"    с {meeting[3]} по {end_time}, участники: {', '.join(participants)}\n"
+            response += "\n"
+
+    return response
+
+
+def _plural_meetings(count):
+    return 'совещание' if count == 1 else 'совещаний'
+
+
+def _calendar_day_lines(date_str, meetings):
+    """Строки одного дня календаря (совещания сгруппированы по создателям)"""
+    if not meetings:
+        return [f"{date_str} - в этот день ни у кого нет совещаний\n\n"]
+
+    by_creator = {}
+    for meeting in meetings:
+        by_creator.setdefault(meeting[1], []).append(meeting)
+
+    lines = []
+    if len(by_creator) == 1:
+        creator, creator_meetings = next(iter(by_creator.items()))
+        lines.append(f"{date_str} - в этот день у {creator} {len(creator_meetings)} "
+                     f"{_plural_meetings(len(creator_meetings))}:\n")
+        indent = "    "
+    else:
+        lines.append(f"{date_str} - В этот день {len(meetings)} совещаний.\n")
+        indent = "        "
+
+    for creator, creator_meetings in by_creator.items():
+        if len(by_creator) > 1:
+            lines.append(f"    У {creator} {len(creator_meetings)} {_plural_meetings(len(creator_meetings))}:\n")
+        for meeting in creator_meetings:
+            end_time = get_end_time(meeting[3], meeting[4])
+            participants = json.loads(meeting[5])
+            lines.append(f"{indent}с {meeting[3]} по {end_time}. Участники: {', '.join(participants)}\n")
+
+    lines.append("\n")
+    return lines
+
+
+def render_calendar(start=0):
+    """
+    Страница общего календаря совещаний (одинакова для всех пользователей)
+
+    Страница начинается с рабочего дня номер start и набирается целыми днями,
+    пока текст помещается в CALENDAR_PAGE_CHARS. Совещания читаются одним
+    запросом по индексу дат начиная с первого дня страницы и только до её
+    заполнения, поэтому время не зависит от общего числа совещаний.
+
+    Returns:
+        (текст страницы, номер первого дня следующей страницы или None)
+    """
+    workdays = get_next_workdays()
+    start = min(max(start, 0), len(workdays) - 1)
+    first_iso = workdays[start][0].strftime("%Y-%m-%d")
+    last_iso = workdays[-1][0].strftime("%Y-%m-%d")
+
+    parts = []
+    size = 0
+    next_start = None
+    shown_days = []
+
+    with closing(db.iter_meetings_between(first_iso, last_iso)) as rows:
+        pending = next(rows, None)
+
+        for index in range(start, len(workdays)):
+            day, date_str = workdays[index]
+            day_iso = day.strftime("%Y-%m-%d")
+
+            # Совещания этого дня (совещания в выходные в календарь не попадают)
+            meetings = []
+            while pending is not None and pending[7] <= day_iso:
+                if pending[7] == day_iso:
+                    meetings.append(pending)
+                pending = next(rows, None)
+
+            lines = _calendar_day_lines(date_str, meetings)
+            day_size = sum(len(line) for line in lines)
+
+            if parts and size + day_size > CALENDAR_PAGE_CHARS:
+                next_start = index
+                break
+
+            if not parts and day_size > CALENDAR_PAGE_CHARS:
+                # Один день не помещается на страницу - показываем сколько влезает
+                kept = []
+                for line in lines:
+                    if size + len(line) > CALENDAR_PAGE_CHARS - 100:
+                        break
+                    kept.append(line)
+                    size += len(line)
+                hidden = sum(1 for line in lines[len(kept):] if line.lstrip().startswith("с "))
+                kept.append(f"    … и ещё {hidden} {_plural_meetings(hidden)}\n\n")
+                lines = kept
+                day_size = 0
+
+            parts.extend(lines)
+            size += day_size
+            shown_days.append(date_str)
+
+    if start == 0 and next_start is None:
+        header = "📅 Календарь совещаний:\n\n"
+    else:
+        header = f"📅 Календарь совещаний ({shown_days[0]} - {shown_days[-1]}):\n\n"
+
+    return header + "".join(parts), next_start
+
+
+def encode_page_history(starts):
+    """Список начал страниц -> payload кнопки ("0", "03", ...)"""
+    return "".join(PAGE_DIGITS[start] for start in starts)
+
+
+def decode_page_history(payload):
+    """Payload кнопки -> список начал страниц (последнее - текущая страница)"""
+    if not payload:
+        raise ValueError("пустая история страниц")
+    return [PAGE_DIGITS.index(char) for char in payload]
+
+
+def render_guest_meetings(username):
+    """Текст экрана "Мои совещания" для приглашенного"""
+    workdays = get_next_workdays()
+    meetings = db.get_meetings_by_participant(username, *get_workdays_range(workdays))
+    workday_dates = {date_str: None for _, date_str in workdays}
+
+    # Группируем совещания по датам
+    for meeting in meetings:
+        date_str = meeting[2]
+        if date_str in workday_dates:
+            if workday_dates[date_str] is None:
+                workday_dates[date_str] = []
+            workday_dates[date_str].append(meeting)
+
+    # Формируем ответ
+    response = "📋 Ваши совещания:\n\n"
+
+    for date_str in workday_dates:
+        if workday_dates[date_str] is None:
+            response += f"📅 {date_str} - В этот день у Вас нет совещаний\n\n"
+        else:
+            response += f"📅 {date_str} - В этот день у Вас {len(workday_dates[date_str])} {'совещание' if len(workday_dates[date_str]) == 1 else 'совещаний'}:\n"
+            for meeting in workday_dates[date_str]:
+                end_time = get_end_time(meeting[3], meeting[4])
+                creator = meeting[1]
+                participants = json.loads(meeting[5])
+                response += f"    с {meeting[3]} по {end_time} у {creator}. Участники: {', '.join(participants)}\n"
+            response += "\n"
+
+    return response
+
+
+RENDERERS = {
+    "my_meetings": render_my_meetings,
+    "calendar": render_calendar,
+    "guest_meetings": render_guest_meetings,
+}
+
+
+# ======================== КЭШ ЭКРАНОВ ========================
+
+class ViewCache:
+    """
+    Кэш готовых текстов экранов
+
+    Ключ - (экран, аргументы экрана, сегодняшняя дата): от даты зависит окно
+    рабочих дней. Аргументы - пользователь для личных экранов и номер первого
+    дня страницы для календаря. Кэш целиком сбрасывается, когда меняется db.data_version (совещание
+    создано или удалено).
+    """
+
+    def __init__(self, max_entries=VIEW_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, view, *args):
+        """Получить экран (результат RENDERERS[view](*args)) из кэша или сформировать его"""
+        key = (view, args, datetime.now().date())
+        version = db.data_version
+
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+            text = self._entries.get(key)
+            if text is not None:
+                self.hits += 1
+                return text
+            self.misses += 1
+
+        text = RENDERERS[view](*args)
+
+        with self._lock:
+            # Пока формировали экран, данные могли измениться - тогда не кэшируем
+            if self._version == version:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = text
+
+        return text
+
+    def get_stats(self):
+        """Статистика кэша"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'data_version': self._version,
+            }
+
+
+# Глобальный экземпляр
+view_cache = ViewCache()
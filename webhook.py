@@ -0,0 +1,155 @@
+# webhook.py
+# HTTP-сервер для приёма обновлений Telegram через webhook (альтернатива infinity_polling)
+#
+# Проверить локально без Telegram можно, отправив сохранённый Update:
+#   curl -X POST http://localhost:10000/<WEBHOOK_PATH> \
+#        -H "X-Telegram-Bot-Api-Secret-Token: <WEBHOOK_SECRET>" \
+#        -H "Content-Type: application/json" -d @update.json
+
+import hmac
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_MAX_BODY
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Лёгкий webhook-сервер на стандартной библиотеке
+
+    POST на секретный путь с правильным заголовком секрета - обновление
+    передаётся в on_update через ограниченный пул потоков, Telegram сразу
+    получает 200. Если очередь пула заполнена - 503 (Telegram повторит позже).
+    GET /healthz - проверка живости (её же пингует KeepAlive).
+    """
+
+    def __init__(self, on_update, path, secret_token, host="0.0.0.0", port=10000,
+                 workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE):
+        """
+        Args:
+            on_update: функция on_update(update_dict) - обработка одного обновления
+            path: секретный путь, на который Telegram присылает обновления
+            secret_token: ожидаемое значение заголовка X-Telegram-Bot-Api-Secret-Token
+            host, port: адрес для прослушивания
+            workers: число потоков обработки
+            queue_size: сколько обновлений может ждать обработки одновременно
+        """
+        self.on_update = on_update
+        self.path = path if path.startswith("/") else f"/{path}"
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook")
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._server = None
+        self.thread = None
+        self.stats = {'received': 0, 'processed': 0, 'errors': 0, 'rejected': 0, 'unauthorized': 0}
+
+    def start(self):
+        """Запустить HTTP-сервер в отдельном потоке"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # если был указан порт 0
+
+        self.thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"🌐 Webhook-сервер слушает {self.host}:{self.port}")
+
+    def stop(self):
+        """Остановить сервер и дождаться обработки принятых обновлений"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        self.executor.shutdown(wait=True)
+        logger.info("🛑 Webhook-сервер остановлен")
+
+    def submit(self, update):
+        """Поставить обновление в пул; False если очередь заполнена"""
+        if not self._slots.acquire(blocking=False):
+            self.stats['rejected'] += 1
+            return False
+
+        self.stats['received'] += 1
+        future = self.executor.submit(self._process, update)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def _process(self, update):
+        """Обработать одно обновление в потоке пула"""
+        try:
+            self.on_update(update)
+            self.stats['processed'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ Ошибка при обработке обновления {update.get('update_id')}: {e}")
+
+    def get_stats(self):
+        """Статистика сервера"""
+        return {'port': self.port, **self.stats}
+
+    def _make_handler(self):
+        """Класс обработчика HTTP-запросов, привязанный к этому серверу"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path in ("/healthz", "/"):
+                    self._reply(200, {"status": "ok", **server.get_stats()})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404, {"error": "not found"})
+                    return
+
+                # Заголовки декодированы как latin-1: сравниваем байты, чтобы не-ASCII не ронял compare_digest
+                token = self.headers.get(SECRET_HEADER, "").encode("latin-1")
+                if not hmac.compare_digest(token, server.secret_token.encode()):
+                    server.stats['unauthorized'] += 1
+                    self._reply(403, {"error": "forbidden"})
+                    return
+
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    self._reply(400, {"error": "bad content length"})
+                    return
+                if length <= 0 or length > WEBHOOK_MAX_BODY:
+                    self._reply(413 if length > 0 else 400, {"error": "bad body size"})
+                    return
+
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._reply(400, {"error": "invalid json"})
+                    return
+                if not isinstance(update, dict):
+                    self._reply(400, {"error": "update must be an object"})
+                    return
+
+                if server.submit(update):
+                    self._reply(200, {"ok": True})
+                else:
+                    self._reply(503, {"error": "busy"})
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"🌐 {self.address_string()} {format % args}")
+
+        return Handler
@@ -0,0 +1,131 @@
+# workers.py
+# Пул обработчиков с сохранением порядка для каждого пользователя
+
+import queue
+import threading
+import time
+import logging
+
+from config import HANDLER_WORKERS, HANDLER_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # сигнал остановки рабочего потока
+
+
+class ShardedExecutor:
+    """
+    Пул потоков, где задачи с одним ключом всегда выполняются одним потоком
+
+    Каждый поток читает свою очередь, ключ (user_id) определяет очередь.
+    Поэтому действия одного пользователя выполняются строго по порядку, а
+    разные пользователи обрабатываются параллельно. Очереди ограничены: если
+    очередь заполнена, submit ждёт места (обратное давление на приём
+    обновлений), задачи не отбрасываются - иначе нажатие пропало бы без ответа.
+    """
+
+    def __init__(self, workers=HANDLER_WORKERS, queue_size=HANDLER_QUEUE_SIZE):
+        """
+        Args:
+            workers: число рабочих потоков
+            queue_size: максимальная длина очереди одного потока
+        """
+        self.workers = workers
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = [
+            {'submitted': 0, 'processed': 0, 'errors': 0, 'blocked': 0,
+             'max_depth': 0, 'wait_time': 0.0}
+            for _ in range(workers)
+        ]
+
+    def start(self):
+        """Запустить рабочие потоки"""
+        if self._threads:
+            logger.warning("⚠️ Пул обработчиков уже запущен")
+            return
+
+        for shard in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(shard,), daemon=True,
+                                      name=f"handler-{shard}")
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"⚙️ Пул обработчиков запущен (потоков: {self.workers})")
+
+    def stop(self, timeout=10):
+        """Остановить потоки после выполнения уже поставленных задач"""
+        for shard_queue in self._queues:
+            shard_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        logger.info("🛑 Пул обработчиков остановлен")
+
+    def shard_for(self, key):
+        """Номер потока для ключа"""
+        return hash(key) % self.workers
+
+    def submit(self, key, func, *args):
+        """
+        Поставить задачу в очередь потока, отвечающего за ключ
+
+        Если очередь заполнена, ждёт, пока поток её разгрузит: вызывающий
+        (polling или поток webhook-сервера) притормаживает приём обновлений.
+        """
+        shard = self.shard_for(key)
+        shard_queue = self._queues[shard]
+        stats = self._stats[shard]
+        item = (func, args, time.perf_counter())
+
+        try:
+            shard_queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                stats['blocked'] += 1
+            shard_queue.put(item)
+
+        with self._lock:
+            stats['submitted'] += 1
+            stats['max_depth'] = max(stats['max_depth'], shard_queue.qsize())
+
+    def _worker_loop(self, shard):
+        """Основной цикл рабочего потока"""
+        shard_queue = self._queues[shard]
+        stats = self._stats[shard]
+
+        while True:
+            item = shard_queue.get()
+            if item is _STOP:
+                break
+
+            func, args, enqueued = item
+            waited = time.perf_counter() - enqueued
+            try:
+                func(*args)
+                ok = True
+            except Exception as e:
+                ok = False
+                logger.error(f"❌ Ошибка в обработчике (поток {shard}): {e}")
+
+            with self._lock:
+                stats['processed' if ok else 'errors'] += 1
+                stats['wait_time'] += waited
+
+    def get_stats(self):
+        """Статистика: глубина очередей и счётчики по каждому потоку"""
+        with self._lock:
+            shards = [
+                {
+                    'depth': self._queues[shard].qsize(),
+                    **{key: value for key, value in stats.items() if key != 'wait_time'},
+                    'avg_wait_ms': round(stats['wait_time'] * 1000 / max(1, stats['processed'] + stats['errors']), 2),
+                }
+                for shard, stats in enumerate(self._stats)
+            ]
+        return {
+            'workers': self.workers,
+            'queued': sum(shard['depth'] for shard in shards),
+            'blocked': sum(shard['blocked'] for shard in shards),
+            'shards': shards,
+        }